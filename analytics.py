@@ -0,0 +1,90 @@
+# --- In-memory analytics aggregation ---
+# Signups/logins are counted in process memory and written to lovebook.db in
+# one UPSERT batch on an interval (and at shutdown), instead of a read-modify-
+# write on its own connection per event. Counts are kept per hour so the admin
+# view can chart traffic; the analytics table still holds the running totals.
+
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from workers import PeriodicWorker
+
+FLUSH_INTERVAL = 10.0
+HOUR_FORMAT = "%Y-%m-%d %H:00"
+
+
+def hour_bucket(when=None):
+    return (when or datetime.now()).strftime(HOUR_FORMAT)
+
+
+class AnalyticsAggregator:
+    def __init__(self, pool, flush_interval=FLUSH_INTERVAL):
+        self.pool = pool
+        self._lock = threading.Lock()
+        # (event, hour bucket) -> count not yet written
+        self._pending = Counter()
+        self._worker = PeriodicWorker(self.flush, flush_interval, name="analytics-flusher").start()
+
+    def increment(self, event, n=1, when=None):
+        with self._lock:
+            self._pending[(event, hour_bucket(when))] += n
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        totals = Counter()
+        for (event, _), n in pending.items():
+            totals[event] += n
+        try:
+            with self.pool.connection() as conn:
+                conn.executemany(
+                    "INSERT INTO analytics_hourly (event, bucket, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT(event, bucket) DO UPDATE SET count = count + excluded.count",
+                    [(event, bucket, n) for (event, bucket), n in pending.items()]
+                )
+                conn.executemany(
+                    "INSERT INTO analytics (event, count) VALUES (?, ?) "
+                    "ON CONFLICT(event) DO UPDATE SET count = count + excluded.count",
+                    list(totals.items())
+                )
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return sum(pending.values())
+
+    def _pending_snapshot(self):
+        with self._lock:
+            return Counter(self._pending)
+
+    def totals(self):
+        """Running total per event, including counts not flushed yet."""
+        with self.pool.connection() as conn:
+            data = Counter(dict(conn.execute("SELECT event, count FROM analytics").fetchall()))
+        for (event, _), n in self._pending_snapshot().items():
+            data[event] += n
+        return dict(data)
+
+    def series(self, granularity="hour", days=7):
+        """``{event: {bucket: count}}`` for the last ``days`` days, hourly or daily."""
+        since = hour_bucket(datetime.now() - timedelta(days=days))
+        width = 16 if granularity == "hour" else 10
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT event, substr(bucket, 1, ?) AS b, SUM(count) FROM analytics_hourly "
+                "WHERE bucket >= ? GROUP BY event, b ORDER BY b",
+                (width, since)
+            ).fetchall()
+        data = {}
+        for event, bucket, n in rows:
+            data.setdefault(event, Counter())[bucket] += n
+        for (event, bucket), n in self._pending_snapshot().items():
+            if bucket >= since:
+                data.setdefault(event, Counter())[bucket[:width]] += n
+        return {event: dict(sorted(counts.items())) for event, counts in data.items()}
+
+    def close(self):
+        self._worker.stop()
@@ -1,5 +1,8 @@
 import hashlib
-import qrcode
+import time
+import uuid
+from functools import partial
+from pathlib import Path
 import streamlit as st
 import sqlite3
 # ...existing code...
@@ -15,78 +18,91 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # --- Kiosk mode flag (for venues, events, etc) ---
-KIOSK_MODE = os.environ.get("KIOSK_MODE", "0") == "1"
+from kiosk import KIOSK_MAX_TTS_QUEUED, KIOSK_MODE, on_demand, pick
+
+# --- Fragments: regions that rerun on their own when one of their widgets changes ---
+# (st.experimental_fragment before Streamlit 1.37)
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+
+def polling_fragment(panel, pending):
+    """``panel`` as a fragment that reruns on its own every second while ``pending``.
+
+    The panel does a full st.rerun() when its job starts or ends, so it is
+    registered again with or without the timer.
+    """
+    return fragment(run_every=1 if pending else None)(panel)
 
 # --- College Edition: Viral Features for Students ---
 
+from db import DB_PATH, ConnectionPool
+
+# One connection pool per process, shared by every session
+@st.cache_resource(show_spinner=False)
+def get_pool():
+    return ConnectionPool(DB_PATH)
+
 def get_db():
-    conn = sqlite3.connect("lovebook.db", check_same_thread=False)
-    conn.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        email TEXT UNIQUE,
-        password_hash TEXT,
-        role TEXT DEFAULT 'free',
-        usage_count INTEGER DEFAULT 0,
-        story TEXT,
-        couple_names TEXT,
-        profile_photo TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    # Analytics table for app hits, signups, logins
-    conn.execute('''CREATE TABLE IF NOT EXISTS analytics (
-        event TEXT PRIMARY KEY,
-        count INTEGER DEFAULT 0
-    )''')
-    return conn
+    return get_pool().connection()
+
+from books import count_books, get_book, get_shared_book, list_books, save_book, set_private, share_token
+from drafts import DraftStore
+
+@st.cache_resource(show_spinner=False)
+def get_draft_store():
+    return DraftStore(get_pool())
+
+from content import catalog, stylesheet
+from cards import TEMPLATES as CARD_TEMPLATES, book_cards, write_card_zip
+from render_service import DONE as RENDER_DONE, FAILED as RENDER_FAILED, QueueFull, RenderService, render_key
+from qr_codes import HOMEPAGE_URL, book_share_url, bulk_qr_png, qr_png
+from static_assets import publish_background
+from story import UNIVERSAL_QUESTIONS, StoryModel
+from tts import DONE as TTS_DONE, FAILED as TTS_FAILED, TTSService
+
+# Background text-to-speech workers; None when no speech engine is installed
+@st.cache_resource(show_spinner=False)
+def get_tts_service():
+    try:
+        return TTSService()
+    except ImportError:
+        return None
+
+from entitlements import EntitlementCache
+
+# Roles by user id, refreshed within seconds of a payment webhook upgrade
+@st.cache_resource(show_spinner=False)
+def get_entitlements():
+    return EntitlementCache(get_pool())
+
+from session_store import SessionStore
+
+# Large per-session artifacts spilled to disk; session state keeps only handles
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    return SessionStore()
+
+# PDFs and share cards render in worker processes; results are cached by input hash
+@st.cache_resource(show_spinner=False)
+def get_render_service():
+    return RenderService()
+
+# Saved books shown per page on the dashboard
+BOOKS_PER_PAGE = 6
 
 # --- Analytics Tracking ---
+from analytics import AnalyticsAggregator
+
+@st.cache_resource(show_spinner=False)
+def get_analytics_aggregator():
+    return AnalyticsAggregator(get_pool())
+
 def increment_analytics(event):
-    conn = get_db()
-    cur = conn.execute("SELECT count FROM analytics WHERE event=?", (event,))
-    row = cur.fetchone()
-    if row:
-        conn.execute("UPDATE analytics SET count = count + 1 WHERE event=?", (event,))
-    else:
-        conn.execute("INSERT INTO analytics (event, count) VALUES (?, 1)", (event,))
-    conn.commit()
-    conn.close()
+    get_analytics_aggregator().increment(event)
 
 # --- Show analytics (admin only, or for demo) ---
 def get_analytics():
-    conn = get_db()
-    cur = conn.execute("SELECT event, count FROM analytics")
-    data = dict(cur.fetchall())
-    conn.close()
-    return data
-
-# Run migration at startup
-def migrate_add_name_column():
-    conn = sqlite3.connect("lovebook.db", check_same_thread=False)
-    cur = conn.execute("PRAGMA table_info(users)")
-    columns = [row[1] for row in cur.fetchall()]
-    if "name" not in columns:
-        try:
-            conn.execute("ALTER TABLE users ADD COLUMN name TEXT")
-            conn.commit()
-        except Exception as e:
-            print(f"Migration error: {e}")
-    conn.close()
-
-migrate_add_name_column()
-
-# Run this once at startup to fill missing names
-def update_missing_names():
-    conn = get_db()
-    cur = conn.execute("SELECT id, name, email FROM users")
-    users = cur.fetchall()
-    for user_id, name, email in users:
-        if not name or name.strip() == '':
-            fallback_name = email.split('@')[0] if email else 'User'
-            conn.execute("UPDATE users SET name=? WHERE id=?", (fallback_name, user_id))
-    conn.commit()
-    conn.close()
-# (No longer call update_missing_names() at startup)
+    return get_analytics_aggregator().totals()
 
 # Page config
 # --- Custom Branding/Theming for Venues ---
@@ -103,78 +119,21 @@ st.set_page_config(
 )
 
 # --- Google Analytics (gtag.js) ---
-st.markdown(f"""
-<script async src='https://www.googletagmanager.com/gtag/js?id=G-75ZF3726F6'></script>
-<style>
-    .sidebar-logo {{
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        margin-bottom: 16px;
-    }}
-    .sidebar-logo img {{
-        width: 120px;
-        border-radius: 16px;
-        box-shadow: 0 4px 16px rgba(255,0,100,0.3), 0 2px 8px rgba(0,0,0,0.15);
-        border: 2px solid #fff;
-        animation: heartbeat 1.5s infinite;
-    }}
-    body {{
-        background: linear-gradient({VENUE_BG_GRADIENT}) !important;
-    }}
-</style>
-""", unsafe_allow_html=True)
-
-# Add top padding to main content so branding header is not cut off
-st.markdown("""
-<style>
-    .block-container {
-        padding-top: 40px !important;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Add global style for clear, modern, and bold fonts for key UI elements
-st.markdown("""
-<style>
-    .stTextInput label, .stTextInput input, .stTextArea label, .stTextArea textarea {
-        font-family: 'Poppins', 'Segoe UI', 'Arial', sans-serif !important;
-        font-size: 1.08rem !important;
-        color: #b91372 !important;
-        font-weight: 600 !important;
-    }
-    .stButton button {
-        font-family: 'Poppins', 'Segoe UI', 'Arial', sans-serif !important;
-        font-size: 1.08rem !important;
-        font-weight: bold !important;
-        color: #fff !important;
-        background: linear-gradient(90deg, #b91372 60%, #ffb6b9 100%) !important;
-        border-radius: 8px !important;
-        border: none !important;
-        box-shadow: 0 2px 8px #b9137240;
-    }
-    .stButton button:hover {
-        background: linear-gradient(90deg, #ffb6b9 0%, #b91372 100%) !important;
-        color: #fff !important;
-    }
-    .stCaption, .stMarkdown, .stSubheader, .stHeader, .stTitle {
-        font-family: 'Poppins', 'Segoe UI', 'Arial', sans-serif !important;
-        color: #b91372 !important;
-    }
-    .stSubheader, .stHeader, .stTitle {
-        font-weight: bold !important;
-    }
-    .stMarkdown strong, .stMarkdown b {
-        color: #b91372 !important;
-        font-weight: bold !important;
-    }
-    .stAlert, .stSuccess, .stError, .stWarning {
-        font-family: 'Poppins', 'Segoe UI', 'Arial', sans-serif !important;
-        font-size: 1.08rem !important;
-        font-weight: bold !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown("<script async src='https://www.googletagmanager.com/gtag/js?id=G-75ZF3726F6'></script>", unsafe_allow_html=True)
+
+# Page CSS (assets/*.css): the full text goes out on a session's first run, later runs only link the cached file
+def emit_styles(*names):
+    sent = st.session_state.setdefault("styles_sent", set())
+    markup = []
+    for name in names:
+        sheet = stylesheet(name, bg_gradient=VENUE_BG_GRADIENT)
+        markup.append(f"<link rel='stylesheet' href='{sheet.href}'>")
+        if sheet.href not in sent:
+            markup.append(f"<style>{sheet.css}</style>")
+            sent.add(sheet.href)
+    st.markdown("".join(markup), unsafe_allow_html=True)
+
+emit_styles("base")
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -182,10 +141,9 @@ def hash_password(password):
 def signup_user(name, email, password):
     if not name or not email or not password:
         return False, "Name, email, and password are required."
-    conn = get_db()
     try:
-        conn.execute("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)", (name, email, hash_password(password)))
-        conn.commit()
+        with get_db() as conn:
+            conn.execute("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)", (name, email, hash_password(password)))
         increment_analytics("signup")
         # Show balloons and welcome if Valentine's Day
         from datetime import datetime
@@ -198,14 +156,11 @@ def signup_user(name, email, password):
         return True, "Signup successful! Please log in."
     except sqlite3.IntegrityError:
         return False, "Email already registered."
-    finally:
-        conn.close()
 
 def login_user(email, password):
-    conn = get_db()
-    cur = conn.execute("SELECT id, name, email, password_hash, role, usage_count, story, couple_names, profile_photo FROM users WHERE email=?", (email,))
-    row = cur.fetchone()
-    conn.close()
+    with get_db() as conn:
+        cur = conn.execute("SELECT id, name, email, password_hash, role, usage_count, story, couple_names, profile_photo FROM users WHERE email=?", (email,))
+        row = cur.fetchone()
     if row and row[3] == hash_password(password):
         increment_analytics("login")
         # Show balloons and welcome if Valentine's Day
@@ -222,17 +177,16 @@ def login_user(email, password):
         }
     return None
 
-def save_user_progress(user_id, story, couple_names):
-    conn = get_db()
-    conn.execute("UPDATE users SET story=?, couple_names=?, usage_count=usage_count+1 WHERE id=?", (story, couple_names, user_id))
-    conn.commit()
-    conn.close()
+def save_user_progress(user_id, story, couple_names, model=None, book_id=None):
+    """Save the generated story; returns the id of the book it was stored as."""
+    with get_db() as conn:
+        conn.execute("UPDATE users SET story=?, couple_names=?, usage_count=usage_count+1 WHERE id=?", (story, couple_names, user_id))
+        return save_book(conn, user_id, model or StoryModel.parse(story), couple_names, book_id=book_id)
 
 def get_user_by_id(user_id):
-    conn = get_db()
-    cur = conn.execute("SELECT id, email, role, usage_count, story, couple_names, profile_photo FROM users WHERE id=?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    with get_db() as conn:
+        cur = conn.execute("SELECT id, email, role, usage_count, story, couple_names, profile_photo FROM users WHERE id=?", (user_id,))
+        row = cur.fetchone()
     if row:
         return {
             "id": row[0], "email": row[1], "role": row[2], "usage_count": row[3],
@@ -251,55 +205,6 @@ def render_branding_header():
 <div class='lovebook-branding'>
     <span>💖 SoulVest LoveBook</span>
 </div>
-<style>
-    .lovebook-branding {
-        width: 100vw;
-        text-align: center;
-        margin-top: 36px;
-        margin-bottom: 0;
-        z-index: 9999;
-        background: transparent;
-        pointer-events: none;
-    }
-    .lovebook-branding span {
-        display: inline-block;
-        font-family: Georgia,serif;
-        color: #b91372;
-        font-weight: bold;
-        font-size: 2.2rem;
-        letter-spacing: 0.5px;
-        background: linear-gradient(90deg, #fff0f6cc 60%, #fae3d9cc 100%);
-        border-radius: 18px;
-        padding: 0.3em 1em;
-        box-shadow: 0 2px 8px #b9137240;
-        border: 2px solid #b91372;
-        word-break: break-word;
-        max-width: 98vw;
-        text-shadow: 0 2px 8px #fff, 0 1px 2px #b9137240;
-        pointer-events: auto;
-    }
-    @media (max-width: 900px) {
-        .lovebook-branding {
-            margin-top: 28px;
-        }
-        .lovebook-branding span {
-            font-size: 1.7rem;
-            padding: 0.25em 0.7em;
-            border-radius: 14px;
-        }
-    }
-    @media (max-width: 600px) {
-        .lovebook-branding {
-            margin-top: 18vw;
-        }
-        .lovebook-branding span {
-            font-size: 1.25rem;
-            padding: 0.22em 0.4em;
-            border-radius: 10px;
-            line-height: 1.2;
-        }
-    }
-</style>
 <script>
 // Add floating hearts dynamically
 if (!window.heartsAdded) {
@@ -333,56 +238,6 @@ def auth_ui():
     # Show onboarding radio only after branding, hero, and how it works
     # (Removed duplicate onboarding radio here)
     st.markdown("""
-<style>
-    .hero-bg-image {
-            min-height: 70vh;
-            width: 100vw;
-            position: relative;
-            background: linear-gradient(135deg, #ffb6b9 0%, #fae3d9 50%, #ff6a88 100%);
-            border-radius: 24px;
-            box-shadow: 0 4px 16px rgba(0,0,0,0.10);
-            margin: 0 0 16px 0;
-            padding: 32px 0 24px 0;
-            overflow: hidden;
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-            align-items: center;
-    }
-    .hero-content {
-            background: rgba(255,255,255,0.92);
-            border-radius: 24px;
-            padding: 48px 32px 32px 32px;
-            box-shadow: 0 2px 8px #b9137240;
-            max-width: 600px;
-            width: 100%;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-    }
-    .main-caption {
-            color: #b91372;
-            font-family: Georgia,serif;
-            font-size: 2.5rem;
-            font-weight: 600;
-            margin-bottom: 18px;
-            letter-spacing: 1px;
-            text-align: center;
-    }
-    .welcome-text {
-            color: #b91372;
-            font-family: 'Segoe UI',sans-serif;
-            font-size: 1.2rem;
-            margin-bottom: 8px;
-            text-align: center;
-    }
-    .subheading {
-            color: #b91372;
-            font-size: 1.1rem;
-            margin-bottom: 32px;
-            text-align: center;
-    }
-</style>
 <div class='hero-bg-image'>
     <div class='hero-content'>
             <div class='welcome-text'>Welcome to SoulVest LoveBook</div>
@@ -435,10 +290,9 @@ def auth_ui():
             success, msg = signup_user(name, email, password)
             if success:
                 # Fetch the new user from DB and set session state
-                conn = get_db()
-                cur = conn.execute("SELECT id, name, email, role, usage_count, story, couple_names, profile_photo FROM users WHERE email=?", (email,))
-                row = cur.fetchone()
-                conn.close()
+                with get_db() as conn:
+                    cur = conn.execute("SELECT id, name, email, role, usage_count, story, couple_names, profile_photo FROM users WHERE email=?", (email,))
+                    row = cur.fetchone()
                 if row:
                     st.session_state.user = {
                         "id": row[0], "name": row[1], "email": row[2], "role": row[3], "usage_count": row[4],
@@ -463,19 +317,41 @@ def auth_ui():
         st.session_state.user = {"role": "guest", "email": None, "id": None, "usage_count": 0, "story": "", "couple_names": ""}
         st.info("Continuing as guest. Some features may be limited.")
 
+# --- Shared book links (?book=<share token>, from a book's QR code) ---
+def shared_book_view(token):
+    """Read-only view of a public book; False if the token does not open one."""
+    with get_db() as conn:
+        shared = get_shared_book(conn, token)
+    if shared is None:
+        st.warning("This book is private or the link is no longer valid. 💌")
+        return False
+    _, title, couple_names, story = shared
+    st.markdown(f"## 📖 {couple_names or title}")
+    model = StoryModel.parse(story or "")
+    for page in model.pages:
+        st.markdown(f"**Page {page.number}: {page.question}**")
+        st.write(page.answer)
+    if not model.pages:
+        # Books carried over from before pages were stored
+        st.write(story or "")
+    st.markdown("---")
+    if st.button("💖 Create your own LoveBook", key="shared_book_start"):
+        del st.query_params["book"]
+        st.rerun()
+    return True
+
+
+shared_token = st.query_params.get("book")
+if shared_token and shared_book_view(shared_token):
+    st.stop()
+
 if 'user' not in st.session_state:
     st.session_state.user = None
 auth_ui()
 user = st.session_state.user
-# --- User Dashboard Tab for Signed-in Users ---
-def get_all_books_for_user(user_id):
-    conn = get_db()
-    cur = conn.execute("SELECT id, story, couple_names, created_at FROM users WHERE id=?", (user_id,))
-    books = cur.fetchall()
-    conn.close()
-    return books
-
-
+# The login snapshot goes stale when a webhook upgrades the account
+if user and user.get('id') is not None:
+    user['role'] = get_entitlements().role(user['id'], default=user.get('role'))
 # --- Persistent Guest Mode Banner ---
 if user and user.get('role') == 'guest':
     if not KIOSK_MODE:
@@ -517,190 +393,33 @@ if 'couple_names' not in st.session_state:
 # Ensure story is always initialized
 if 'story' not in st.session_state:
     st.session_state.story = ""
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+# Keeps this session's artifacts from being evicted as idle, and accounts its memory
+get_session_store().touch(st.session_state.session_id, st.session_state)
 
 
-# --- Image Upload for Background ---
-uploaded_bg = None
+# Parsed structure of the current story, re-parsed only when the story text changes
+def current_story_model():
+    story = st.session_state.story
+    model = st.session_state.get('story_model')
+    if model is None or (model.text is not story and model.text != story):
+        model = StoryModel.parse(story)
+        st.session_state.story_model = model
+    return model
 
-bg_css = """
-<style>
-    html {
-        font-size: 16px;
-    }
-    @media (max-width: 600px) {
-        html { font-size: 15px; }
-        .block-container { padding: 0.5rem !important; }
-        .stButton>button { font-size: 20px !important; padding: 16px 0 !important; width: 100% !important; }
-        .stTextArea textarea, .stTextInput input { font-size: 18px !important; }
-        h1, h2, h3, h4 { font-size: 1.3em !important; }
-    }
-    .sidebar-logo {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        margin-bottom: 16px;
-    }
-    .sidebar-logo img {
-        width: 120px;
-        border-radius: 16px;
-        box-shadow: 0 4px 16px rgba(255,0,100,0.3), 0 2px 8px rgba(0,0,0,0.15);
-        border: 2px solid #fff;
-        animation: heartbeat 1.5s infinite;
-    }
-    body {
-        background: linear-gradient(135deg, #ffb6b9 0%, #fae3d9 50%, #ff6a88 100%) !important;
-    }
-    .main {
-        background: linear-gradient(135deg, #ffb6b9 0%, #fae3d9 50%, #ff6a88 100%);
-    }
-    .block-container {
-        padding: 2rem;
-        background: rgba(255,255,255,0.92);
-        border-radius: 22px;
-        box-shadow: 0 8px 32px 0 rgba(255, 182, 193, 0.25);
-    }
-    h1 {
-        color: #b91372;
-        text-align: center;
-        font-family: 'Georgia', serif;
-        letter-spacing: 2px;
-    }
-    .stButton>button {
-        background: linear-gradient(90deg, #ff6a88 0%, #ffb6b9 100%);
-        color: white;
-        border-radius: 14px;
-        padding: 12px 36px;
-        font-size: 18px;
-        border: none;
-        font-family: 'Georgia', serif;
-        font-weight: bold;
-        box-shadow: 0 2px 8px rgba(255, 182, 193, 0.15);
-        transition: background 0.2s, box-shadow 0.2s;
-    }
-    .stButton>button:hover {
-        background: linear-gradient(90deg, #fae3d9 0%, #ffb6b9 100%);
-    }
-    .memory-card {
-        background: #fff0f6;
-        padding: 24px;
-        border-radius: 18px;
-        box-shadow: 0 4px 16px rgba(255, 182, 193, 0.13);
-        margin: 14px 0;
-    }
-    .chapter-title {
-        color: #b91372;
-        font-size: 26px;
-        font-weight: bold;
-        margin-top: 24px;
-        font-family: 'Georgia', serif;
-    }
-    .story-text {
-        font-family: 'Georgia', serif;
-        font-size: 18px;
-        line-height: 2.0;
-        color: #b91372;
-        background: #fff0f6;
-        padding: 28px;
-        border-radius: 14px;
-        border-left: 6px solid #ee9ca7;
-        box-shadow: 0 2px 8px rgba(255, 182, 193, 0.10);
-    }
-    /* Sidebar Valentine theme */
-    [data-testid="stSidebar"] > div:first-child {
-        background: linear-gradient(135deg, #ffb6b9 0%, #fae3d9 100%);
-        border-radius: 0 22px 22px 0;
-        box-shadow: 0 4px 16px rgba(255, 182, 193, 0.13);
-        padding: 32px 18px 24px 18px;
-        min-height: 100vh;
-        position: relative;
-        font-family: 'Poppins', 'Georgia', serif !important;
-        color: #b91372 !important;
-        font-size: 18px !important;
-    }
-    [data-testid="stSidebar"]:before {
-        content: "";
-        display: block;
-        position: absolute;
-        top: 0; left: 0; width: 100%; height: 100%;
-        background: url('https://img.icons8.com/emoji/48/000000/red-heart.png') repeat-y;
-        opacity: 0.12;
-        z-index: 0;
-    }
-    .sidebar-logo {
-        display: flex;
-        align-items: flex-start;
-        margin-bottom: 18px;
-    }
-    .sidebar-logo img {
-        width: 120px;
-        height: auto;
-        margin-right: 12px;
-        border-radius: 18px;
-        box-shadow: 0 6px 24px 0 rgba(255, 106, 136, 0.35), 0 2px 8px rgba(255, 182, 193, 0.18);
-        border: 3px solid #ff6a88;
-        transition: transform 0.3s;
-        animation: logoPulse 2s infinite;
-    }
-    @keyframes logoPulse {
-        0% { transform: scale(1); }
-        50% { transform: scale(1.08); box-shadow: 0 12px 32px 0 rgba(255, 106, 136, 0.45); }
-        100% { transform: scale(1); }
-    }
-    .sidebar-title {
-        font-size: 24px;
-        font-weight: bold;
-        color: #b91372;
-        font-family: 'Poppins', 'Georgia', serif;
-        margin-top: 8px;
-        margin-bottom: 8px;
-    }
-    .sidebar-section {
-        font-size: 18px;
-        color: #b91372;
-        font-family: 'Poppins', 'Georgia', serif;
-        margin-bottom: 12px;
-    }
-    .sidebar-link {
-        color: #ff6a88 !important;
-        font-weight: bold;
-        font-size: 18px;
-        text-decoration: underline;
-    }
-    .sidebar-song {
-        font-size: 17px;
-        color: #b91372;
-        margin-bottom: 6px;
-    }
-    .sidebar-section-title {
-        font-size: 20px;
-        font-weight: bold;
-        color: #b91372;
-        margin-top: 18px;
-        margin-bottom: 8px;
-    }
-    /* Main text improvements */
-    .main, .block-container, .story-text {
-        font-family: 'Poppins', 'Georgia', serif !important;
-        color: #b91372 !important;
-        font-size: 20px !important;
-    }
-</style>
-"""
+
+# --- Image Upload for Background ---
+# The uploader lives in the Create tab further down; reuse its value from the last run
+uploaded_bg = st.session_state.get("main_bg_upload")
 
 if uploaded_bg is not None:
-    import base64
-    from PIL import Image
-    img = Image.open(uploaded_bg)
-    img = img.resize((1920, 1080))
-    buf = st.experimental_memo(lambda: None, ttl=0)()
-    from io import BytesIO
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    img_b64 = base64.b64encode(buffered.getvalue()).decode()
+    # Stored once as a compressed web rendition and referenced by URL, not inlined
+    bg_url = publish_background(uploaded_bg.getvalue())
     custom_bg = f"""
     <style>
     body {{
-        background-image: url('data:image/png;base64,{img_b64}');
+        background-image: url('{bg_url}');
         background-size: cover !important;
         background-attachment: fixed !important;
     }}
@@ -713,31 +432,8 @@ if uploaded_bg is not None:
     </style>
     """
     st.markdown(custom_bg, unsafe_allow_html=True)
-
-    # Hide Ctrl+Enter hint in text areas
-    st.markdown("""
-    <style>
-    .stTextArea [data-baseweb="textarea"] + div {
-        display: none !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
 else:
-    st.markdown(bg_css, unsafe_allow_html=True)
-    st.markdown("""
-    <style>
-    .stTextArea [data-baseweb="textarea"] + div {
-        display: none !important;
-    }
-    .stTextArea textarea {
-        min-height: 32px !important;
-        max-height: 40px !important;
-        font-size: 16px !important;
-        padding: 6px 10px !important;
-        border-radius: 8px !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    emit_styles("theme")
 
 
  # st.title("💖 SoulVest LoveBook")  # Removed duplicate title, branding header is already shown
@@ -773,63 +469,18 @@ st.markdown(":sparkling_heart: <span style='font-size:20px;color:#b91372;'>Let y
 # --- Valentine's Day Tips Section ---
 with st.expander("💡 Valentine's Day Tips: Plan the Perfect Day & Gift Ideas", expanded=True):
     st.markdown("**Plan a Memorable Valentine's Day:**")
-    plan_ideas = [
-        "Start with a heartfelt breakfast in bed or a surprise morning note",
-        "Plan a day of shared activities: a walk, a movie, a picnic, or a favorite hobby together",
-        "Write a love letter or create a digital memory book together (right here!)",
-        "Cook a special meal or order from your favorite restaurant",
-        "Set aside time for a meaningful conversation—share dreams, memories, or future plans",
-        "End the day with a cozy movie night, stargazing, or a playlist of your favorite songs",
-        "Create a couple's vision board for your future together",
-        "Do a TikTok or Instagram challenge together and share your fun side",
-        "Recreate your first date at home or outdoors",
-        "Try a new hobby together: pottery, painting, or dancing (even via YouTube)",
-        "Host a virtual double date with friends or family",
-        "Make a time capsule with notes and mementos to open next year",
-        "Go on a spontaneous mini road trip or city adventure"
-    ]
-    import random
     st.markdown(":star2: <span style='color:#b91372;'>Here are some creative ideas for your day:</span>", unsafe_allow_html=True)
-    for idea in random.sample(plan_ideas, 5):
+    for idea in pick("plan_ideas", catalog()["plan_ideas"], 5):
         st.markdown(f"- {idea}")
 
     st.markdown("**Gift Ideas:**")
-    gift_ideas = [
-        "A personalized memory book (download your story as a PDF!)",
-        "A handwritten letter or poem",
-        "A custom playlist of your favorite songs",
-        "A framed photo or collage",
-        "A surprise video message from friends/family",
-        "A DIY gift: scrapbook, jar of love notes, or a handmade card",
-        "An experience: online class, virtual tour, or a future date voucher",
-        "A star map of the night you met",
-        "A custom couple's illustration or caricature",
-        "A personalized puzzle with your photo",
-        "A subscription box (wine, books, games, or snacks)",
-        "A QR code that links to a secret love message or video",
-        "A plant or bonsai to grow together as a symbol of your relationship",
-        "A couple's game night kit (board games, card games, or trivia)",
-        "A surprise scavenger hunt with clues around your home or city"
-    ]
     st.markdown(":gift_heart: <span style='color:#b91372;'>Unique gift ideas to surprise your partner:</span>", unsafe_allow_html=True)
-    for idea in random.sample(gift_ideas, 5):
+    for idea in pick("gift_ideas", catalog()["gift_ideas"], 5):
         st.markdown(f"- {idea}")
 
     st.markdown("**Bonus:**")
     st.markdown("Try the Ho'oponopono practice: 'I'm sorry. Please forgive me. Thank you. I love you.' Say it, write it, or include it in your book for a healing, loving touch.")
-import random
-romantic_quotes = [
-        ("Love is composed of a single soul inhabiting two bodies.", "Aristotle"),
-        ("Whatever our souls are made of, his and mine are the same.", "Emily Brontë"),
-        ("I have found the one whom my soul loves.", "Song of Solomon 3:4"),
-        ("You are my today and all of my tomorrows.", "Leo Christopher"),
-        ("In all the world, there is no heart for me like yours.", "Maya Angelou"),
-        ("The best thing to hold onto in life is each other.", "Audrey Hepburn"),
-        ("To love and be loved is to feel the sun from both sides.", "David Viscott"),
-        ("I would rather spend one lifetime with you than face all the ages of this world alone.", "J.R.R. Tolkien"),
-        ("You are my greatest adventure.", "The Incredibles"),
-]
-quote, author = random.choice(romantic_quotes)
+quote, author = pick("romantic_quote", catalog()["romantic_quotes"], 1)[0]
 st.markdown(f"""
 <div style='text-align:center; margin: 18px 0 0 0;'>
     <span style='font-size:28px; color:#b91372; font-family:Georgia,serif; font-weight:bold; letter-spacing:1px;'>
@@ -855,11 +506,12 @@ with stats_col1:
     st.write("Last Activity")
     st.write(f"**{last_activity}**")
 with stats_col2:
-    entries = len(st.session_state.story.split('\n\n')) if st.session_state.story else 0
+    story_model = current_story_model()
+    entries = story_model.entry_count
     st.write("Entries")
     st.write(f"**{entries}**")
     # Total words written
-    total_words = len(st.session_state.story.split()) if st.session_state.story else 0
+    total_words = story_model.word_count
     st.write("Total Words Written")
     st.write(f"**{total_words}**")
 
@@ -870,9 +522,22 @@ if user and user.get('email') == 'soulvest1111@gmail.com':
      analytics = get_analytics()
      st.write(f"Signups: {analytics.get('signup', 0)}")
      st.write(f"Logins: {analytics.get('login', 0)}")
+     granularity = st.radio("Traffic by", ["hour", "day"], horizontal=True, key="analytics_granularity")
+     traffic = get_analytics_aggregator().series(granularity, days=2 if granularity == "hour" else 30)
+     if traffic:
+         st.line_chart(traffic)
+     sessions = get_session_store().stats()
+     st.write(f"Active sessions: {sessions['sessions']} · state ≈ {sessions['memory_bytes'] / 1e6:.1f} MB · "
+              f"artifacts on disk {sessions['disk_bytes'] / 1e6:.1f} MB")
+     renders = get_render_service().stats()
+     st.write(f"Renders: {renders['running']} running, {renders['queued']} queued on {renders['workers']} workers · "
+              f"cache {renders['cache']['entries']} items, {renders['cache']['bytes'] / 1e6:.1f} MB")
 
 import os
-with st.sidebar:
+
+# Tips, profile edits and the extras only rerun the sidebar
+@fragment
+def render_sidebar():
     # --- My Account/Profile Section ---
     user = st.session_state.get('user', {})
     with st.expander("👤 My Account", expanded=True):
@@ -901,130 +566,98 @@ with st.sidebar:
     <button style='background:#f37254;color:#fff;border:none;padding:12px 32px;border-radius:18px;font-size:1.1rem;cursor:not-allowed;opacity:0.6;' disabled>Upgrade to Premium (Coming Soon)</button>
     """, unsafe_allow_html=True)
         st.info("Premium upgrade is coming soon! Payment is currently disabled.")
-    # --- Edit Profile Section ---
-    st.subheader("Edit Profile")
-    new_name = st.text_input("Name", value=user.get('name',''), key="edit_name")
-    new_email = st.text_input("Email", value=user.get('email',''), key="edit_email")
-    new_photo = st.file_uploader("Update Profile Photo", type=["jpg","jpeg","png"], key="edit_photo")
-    if new_photo is not None:
-        st.image(new_photo, width=72, caption="Preview")
-    if st.button("Save Changes", key="save_profile_btn", help="Update your profile info"):
-        photo_path = None
+    if not KIOSK_MODE:
+        # --- Edit Profile Section ---
+        st.subheader("Edit Profile")
+        new_name = st.text_input("Name", value=user.get('name',''), key="edit_name")
+        new_email = st.text_input("Email", value=user.get('email',''), key="edit_email")
+        new_photo = st.file_uploader("Update Profile Photo", type=["jpg","jpeg","png"], key="edit_photo")
         if new_photo is not None:
-            import tempfile
-            import shutil
-            temp_dir = tempfile.gettempdir()
-            photo_path = os.path.join(temp_dir, new_photo.name)
-            with open(photo_path, "wb") as f:
-                shutil.copyfileobj(new_photo, f)
-        update_user_profile(user['id'], new_name, new_email, photo_path)
-        st.session_state.user['name'] = new_name
-        st.session_state.user['email'] = new_email
-        if photo_path:
-            st.session_state.user['profile_photo'] = photo_path
-        st.success("Profile updated!")
-    # QR code for homepage quick access
-    HOMEPAGE_URL = "https://soulvest-lovebook.streamlit.app/"  # Updated homepage URL
-    def generate_qr_code(url):
-        qr = qrcode.QRCode(version=1, box_size=8, border=2)
-        qr.add_data(url)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="#b91372", back_color="white").convert('RGB')
-        return img
+            st.image(new_photo, width=72, caption="Preview")
+        if st.button("Save Changes", key="save_profile_btn", help="Update your profile info"):
+            photo_path = None
+            if new_photo is not None:
+                import tempfile
+                import shutil
+                temp_dir = tempfile.gettempdir()
+                photo_path = os.path.join(temp_dir, new_photo.name)
+                with open(photo_path, "wb") as f:
+                    shutil.copyfileobj(new_photo, f)
+            update_user_profile(user['id'], new_name, new_email, photo_path)
+            st.session_state.user['name'] = new_name
+            st.session_state.user['email'] = new_email
+            if photo_path:
+                st.session_state.user['profile_photo'] = photo_path
+            # The name is shown outside the sidebar too, so rerun the whole page
+            st.session_state.profile_saved = True
+            st.rerun()
+        if st.session_state.pop('profile_saved', False):
+            st.success("Profile updated!")
+    # QR code for homepage quick access (rendered once per process)
     st.markdown("<div style='text-align:center;'><b>Scan to use LoveBook anywhere!</b></div>", unsafe_allow_html=True)
-    st.image(generate_qr_code(HOMEPAGE_URL), caption="Open LoveBook on your phone", width=200)
-    with st.expander("🤔 Did You Know? Ho'oponopono"):
-        st.markdown("Have you heard of Ho'oponopono?")
+    st.image(qr_png(HOMEPAGE_URL), caption="Open LoveBook on your phone", width=200)
+    if on_demand("sidebar_extras", "💡 More tips & gift ideas"):
+        with st.expander("🤔 Did You Know? Ho'oponopono"):
+            st.markdown("Have you heard of Ho'oponopono?")
+            st.markdown("""
+            <span style='color:#b91372;'>
+            <b>Ho'oponopono</b> is a Hawaiian practice of reconciliation and forgiveness. It helps heal relationships by encouraging us to say four simple phrases:
+            <br><br>
+            <b>I'm sorry. Please forgive me. Thank you. I love you.</b>
+            <br><br>
+            Use these words to express your feelings, release past hurts, and invite harmony into your relationship. Even if spoken or written silently, they can bring peace and understanding.
+            </span>
+            """, unsafe_allow_html=True)
+        st.markdown('<div class="sidebar-logo">', unsafe_allow_html=True)
+        st.image(VENUE_LOGO, width=120)
+        st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown("<span class='sidebar-title'>SoulVest LoveBook</span>", unsafe_allow_html=True)
+        # File uploader removed from sidebar; only appears in main content area
+        st.markdown("---")
+        # Removed duplicate Love Language Suggestions section
+        st.markdown("### 💝 How it works")
         st.markdown("""
-        <span style='color:#b91372;'>
-        <b>Ho'oponopono</b> is a Hawaiian practice of reconciliation and forgiveness. It helps heal relationships by encouraging us to say four simple phrases:
-        <br><br>
-        <b>I'm sorry. Please forgive me. Thank you. I love you.</b>
-        <br><br>
-        Use these words to express your feelings, release past hurts, and invite harmony into your relationship. Even if spoken or written silently, they can bring peace and understanding.
-        </span>
-        """, unsafe_allow_html=True)
-    st.markdown('<div class="sidebar-logo">', unsafe_allow_html=True)
-    st.image(VENUE_LOGO, width=120)
-    st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown("<span class='sidebar-title'>SoulVest LoveBook</span>", unsafe_allow_html=True)
-    # File uploader removed from sidebar; only appears in main content area
-    st.markdown("---")
-    # Removed duplicate Love Language Suggestions section
-    st.markdown("### 💝 How it works")
-    st.markdown("""
-    1. **Fill in your memories** and answer fun, thoughtful questions together
-    2. **See your story come alive** as a keepsake PDF
-    3. **Add more memories or reflections** anytime!
+        1. **Fill in your memories** and answer fun, thoughtful questions together
+        2. **See your story come alive** as a keepsake PDF
+        3. **Add more memories or reflections** anytime!
 
-    <span style='color:#b91372;font-size:16px;'><b>Data Privacy:</b> Everything you enter—names, memories, photos, and feedback—stays <b>only in your browser</b> and is <b>never uploaded or shared</b>. Your privacy and comfort are our top priority.</span>
+        <span style='color:#b91372;font-size:16px;'><b>Data Privacy:</b> Everything you enter—names, memories, photos, and feedback—stays <b>only in your browser</b> and is <b>never uploaded or shared</b>. Your privacy and comfort are our top priority.</span>
 
-    <span style='font-weight:bold;'>Perfect for:</span>
-    - Rediscovering each other
-    - Sharing a laugh or a memory
-    - Celebrating your unique bond
-    - Valentine's Day, anniversaries, or any day you want to connect ❤️
-    """, unsafe_allow_html=True)
-    st.markdown("---")
-    st.markdown("### 💡 Pro Love & Relationship Tips")
-    pro_tips = [
-        "What's your partner's love language? Try a little experiment—give them a compliment, a hug, or a small surprise and see what makes them light up!",
-        "Ever just listened, really listened, to your partner? Sometimes, that's all it takes to make their day.",
-        "A quick thank you or a silly compliment can turn an ordinary moment into something special. Sprinkle them often!",
-        "Disagreements? Totally normal! Next time, try saying 'I feel...' instead of 'You always...'. It keeps things chill.",
-        "Messed up? Happens to everyone. A simple 'I'm sorry' (and a hug) can work wonders.",
-        "Busy week? Even 10 minutes of phone-free time together can feel like a mini-vacation.",
-        "Ask your partner something new about their childhood or dreams. You might be surprised what you learn!",
-        "Cheer each other on—big wins, small wins, or just making it through Monday. High fives encouraged!",
-        "Don't forget the power of a random hug, a kiss on the forehead, or holding hands. Feels good, right?",
-        "Laughter is the best glue. Share a meme, watch a funny video, or just be silly together!",
-        "Share your feelings, not just your plans. Emotional closeness is the real magic.",
-        "When things get tough, sometimes a listening ear or a warm cup of tea means more than any gift. Be there for each other.",
-        "Did you know? The Hawaiian practice of Ho'oponopono uses four simple phrases—I'm sorry. Please forgive me. Thank you. I love you.—to heal and strengthen relationships. Try writing or saying these words to your partner for a powerful, loving impact!"
-    ]
-    import random
-    if 'tip_index' not in st.session_state:
-        st.session_state.tip_index = random.randint(0, len(pro_tips)-1)
-    if st.button('Show me another tip', key='next_tip'):
-        st.session_state.tip_index = (st.session_state.tip_index + 1) % len(pro_tips)
-    st.info(pro_tips[st.session_state.tip_index])
-    st.markdown("### 🎁 Gift Ideas for Every Age Group")
-    st.markdown("<span style='color:#b91372;font-size:16px;'>Surprise your loved one with a thoughtful gift! Here are some ideas for different age groups:</span>", unsafe_allow_html=True)
-    age_gift_ideas = {
-        'Young Couples (18-25)': [
-            "Personalized photo album or scrapbook",
-            "A fun experience: concert, amusement park, or escape room",
-            "Trendy gadgets or matching accessories",
-            "Handwritten love letters or a jar of date night ideas"
-        ],
-        'Midlife Couples (26-45)': [
-            "A weekend getaway or staycation",
-            "Customized jewelry or watches",
-            "Cooking class or wine tasting experience",
-            "A framed photo from a special memory"
-        ],
-        'Older Couples (46+)': [
-            "A relaxing spa day or massage voucher",
-            "Personalized keepsake (engraved frame, custom art)",
-            "A favorite book or music collection",
-            "A cozy dinner at a favorite restaurant or at home"
-        ]
-    }
-    for group, ideas in age_gift_ideas.items():
-        st.markdown(f"<b>{group}</b>", unsafe_allow_html=True)
-        for idea in ideas:
-            st.markdown(f"- {idea}")
-    st.markdown("<span style='color:#b91372;font-size:15px;'>Or order from these popular sites:</span>", unsafe_allow_html=True)
-    st.markdown("""
-    - [Ferns N Petals (FNP)](https://www.fnp.com/)
-    - [FlowerAura](https://www.floweraura.com/)
-    - [Winni](https://www.winni.in/)
-    - [GiftstoIndia24x7](https://www.giftstoindia24x7.com/)
-    - [Archies Online](https://www.archiesonline.com/)
-    """)
+        <span style='font-weight:bold;'>Perfect for:</span>
+        - Rediscovering each other
+        - Sharing a laugh or a memory
+        - Celebrating your unique bond
+        - Valentine's Day, anniversaries, or any day you want to connect ❤️
+        """, unsafe_allow_html=True)
+        st.markdown("---")
+        st.markdown("### 💡 Pro Love & Relationship Tips")
+        pro_tips = catalog()["pro_tips"]
+        import random
+        if 'tip_index' not in st.session_state:
+            st.session_state.tip_index = random.randint(0, len(pro_tips)-1)
+        if st.button('Show me another tip', key='next_tip'):
+            st.session_state.tip_index = (st.session_state.tip_index + 1) % len(pro_tips)
+        st.info(pro_tips[st.session_state.tip_index])
+        st.markdown("### 🎁 Gift Ideas for Every Age Group")
+        st.markdown("<span style='color:#b91372;font-size:16px;'>Surprise your loved one with a thoughtful gift! Here are some ideas for different age groups:</span>", unsafe_allow_html=True)
+        for group, ideas in catalog()["age_gift_ideas"].items():
+            st.markdown(f"<b>{group}</b>", unsafe_allow_html=True)
+            for idea in ideas:
+                st.markdown(f"- {idea}")
+        st.markdown("<span style='color:#b91372;font-size:15px;'>Or order from these popular sites:</span>", unsafe_allow_html=True)
+        st.markdown("""
+        - [Ferns N Petals (FNP)](https://www.fnp.com/)
+        - [FlowerAura](https://www.floweraura.com/)
+        - [Winni](https://www.winni.in/)
+        - [GiftstoIndia24x7](https://www.giftstoindia24x7.com/)
+        - [Archies Online](https://www.archiesonline.com/)
+        """)
     st.markdown("---")
     st.markdown("**Made with ❤️ by [SoulVest.ai](https://soulvest.ai)**")
 
+with st.sidebar:
+    render_sidebar()
+
 
 # Main content
 dashboard_tab = None
@@ -1088,24 +721,21 @@ with tab1:
         person2_name = st.text_input("", key="p2", label_visibility="collapsed")
 
     # Universal question set for all couples
-    universal_questions = [
-        ("How did you first meet or notice each other?", "E.g. At a coffee shop, college, online...", "first_meeting", "Tip: Recall your first encounter."),
-        ("What's your favorite memory together?", "E.g. Trips, celebrations, funny moments...", "fav_memory", "Tip: A moment that stands out!"),
-        ("Describe a challenge you overcame as a couple.", "E.g. Moving, studies, raising kids...", "challenge", "Tip: How did you support each other?"),
-        ("What keeps your bond strong?", "E.g. Shared rituals, humor, communication...", "bond", "Tip: Your secret to lasting love!"),
-        ("What is your dream for the future together?", "E.g. Travel, family, new adventures...", "future_dream", "Tip: Looking ahead."),
-        ("What was your first date like?", "E.g. Nervous, exciting...", "first_date", "Tip: Recall your first outing together."),
-        ("Describe a funny or embarrassing moment together.", "E.g. Mishaps, jokes...", "funny_moment", "Tip: Light-hearted stories."),
-        ("What is your favorite way to spend time together?", "E.g. Walks, cooking...", "fav_time", "Tip: Daily routines or special occasions."),
-        ("How do you handle disagreements?", "E.g. Communication, humor...", "handle_disagreements", "Tip: Conflict resolution."),
-        ("What advice would you give to couples?", "E.g. Patience, kindness...", "couple_advice", "Tip: Share your wisdom.")
-    ]
+    universal_questions = UNIVERSAL_QUESTIONS
 
     # Let user select a question set
     st.markdown("### Choose a Question Set for Your Book")
     st.markdown("### Memory Book Questions for All Couples")
     questions = universal_questions
 
+    is_member = user and user.get('role') not in (None, 'guest')
+    # Restore an autosaved draft once per session, before the widgets exist
+    if is_member and st.session_state.get('draft_restored') != user['id']:
+        st.session_state.draft_restored = user['id']
+        for key, ans in get_draft_store().load(user['id']).items():
+            if not st.session_state.get(f"ans_{key}"):
+                st.session_state[f"ans_{key}"] = ans
+
     answers = {}
     for idx, (q, ph, key, tip) in enumerate(questions):
         st.write(f"{idx+1}. {q}")
@@ -1118,39 +748,48 @@ with tab1:
             label_visibility="collapsed",
             help=" "
         )
-        # ...existing code...
-        # --- Autosave for signed-in users ---
-        if user and user.get('role') not in (None, 'guest'):
-            # Save partial progress (answers) as a draft story
-            partial_story = f"{st.session_state.get('p1','')} & {st.session_state.get('p2','')}'s Memory Book\n\n"
-            for jdx, (q2, ph2, key2, tip2) in enumerate(questions):
-                ans2 = st.session_state.get(f"ans_{key2}", '').strip()
-                if ans2:
-                    partial_story += f"Page {jdx+1}: {q2}\n\n{ans2}\n\n"
-            save_user_progress(user['id'], partial_story, f"{st.session_state.get('p1','')} & {st.session_state.get('p2','')}")
+
+    # Keep a parsed draft of the book; only the pages whose answer changed are rebuilt
+    draft_names = f"{st.session_state.get('p1','')} & {st.session_state.get('p2','')}"
+    draft_model = st.session_state.get('draft_model') or StoryModel.build(draft_names, questions, {})
+    if draft_model.title != f"{draft_names}'s Memory Book":
+        draft_model = draft_model.with_title(draft_names)
+    for key, ans in answers.items():
+        page = draft_model.page_for(key)
+        if (page.answer if page else '') != (ans or '').strip():
+            draft_model = draft_model.with_answer(questions, key, ans)
+    st.session_state.draft_model = draft_model
+    st.caption(f"Your book so far: {len(draft_model.pages)} pages, {draft_model.word_count} words")
+
+    # --- Autosave for signed-in users ---
+    # Only changed answers are queued; the draft store writes them in the background.
+    # Once a book is saved its draft is dropped, until the answers change again.
+    if is_member and st.session_state.get('saved_draft_text') != draft_model.text:
+        get_draft_store().update(user['id'], answers, f"{st.session_state.get('p1','')} & {st.session_state.get('p2','')}")
 
     # Generate button
     col1, col2, col3 = st.columns([1,2,1])
     with col2:
         if st.button("✨ Generate Our Memory Book", use_container_width=True):
-            required_fields = [person1_name, person2_name, answers.get('first_meeting',''), answers.get('smile_memory','')]
+            required_fields = [person1_name, person2_name, answers.get('first_meeting',''), answers.get('fav_memory','')]
             if not all(required_fields):
                 st.error("⚠️ Please fill in at least: Names and the first two questions.")
             else:
                 with st.spinner("Creating your beautiful memory book... 📖"):
-                    # Build story from all answers
-                    story = f"""
-{person1_name} & {person2_name}'s Memory Book\n\n"""
-                    for idx, (q, ph, key, tip) in enumerate(questions):
-                        ans = answers.get(key, '').strip()
-                        if ans:
-                            story += f"Page {idx+1}: {q}\n\n{ans}\n\n"
+                    # The draft model already holds the story built from all answers
+                    story = draft_model.text
                     st.session_state.story = story
+                    st.session_state.story_model = draft_model
                     st.session_state.story_generated = True
                     st.session_state.couple_names = f"{person1_name} & {person2_name}"
                     # Save to DB for persistence only if not guest
                     if user and user.get('role') != 'guest':
-                        save_user_progress(user['id'], story, st.session_state.couple_names)
+                        st.session_state.book_id = save_user_progress(
+                            user['id'], story, st.session_state.couple_names,
+                            model=draft_model, book_id=st.session_state.get('book_id')
+                        )
+                        get_draft_store().discard(user['id'])
+                        st.session_state.saved_draft_text = draft_model.text
                         st.success("✨ Your memory book is ready!")
                         st.balloons()
                         st.info("Your story was crafted using your own beautiful memories and words. Go to the 'View Your Story' tab to see it and share the love!")
@@ -1181,139 +820,77 @@ with tab1:
                         else:
                             st.error(msg)
 
-with tab2:
-    # ...existing code for View Your Story...
-    # --- Shareable Love Story Card Section (moved here) ---
-    if st.session_state.get('story_generated') and st.session_state.story:
-        st.markdown("---")
-        st.subheader("💌 Create a Shareable Love Story Card")
-        st.caption("Pick your favorite memory or quote and turn it into a beautiful image to share on WhatsApp, Instagram, or anywhere!")
-        default_card_text = st.session_state.story.split('\n\n')[0] if st.session_state.story else "Love is all we need."
-        card_text = st.text_area("Your favorite memory or quote", value=default_card_text, max_chars=180, height=80, key="card_text")
-        card_bg_color = st.color_picker("Card background color", value="#ffb6b9", key="card_bg_color")
-        card_text_color = st.color_picker("Text color", value="#b91372", key="card_text_color")
-        if st.button("Generate Card Image", key="generate_card_img"):
-            from PIL import Image, ImageDraw, ImageFont
-            import io
-            # Card size (mobile-friendly)
-            W, H = 720, 900
-            img = Image.new("RGB", (W, H), card_bg_color)
-            draw = ImageDraw.Draw(img)
-            # Try to use a nice font, fallback to default
-            try:
-                font = ImageFont.truetype("arial.ttf", 48)
-            except:
-                font = ImageFont.load_default()
-            # Word wrap
-            import textwrap
-            lines = textwrap.wrap(card_text, width=22)
-            y_text = H//3
-            for line in lines:
-                w, h = draw.textsize(line, font=font)
-                draw.text(((W-w)//2, y_text), line, font=font, fill=card_text_color)
-                y_text += h + 10
-            # Branding at bottom
-            brand_font = ImageFont.truetype("arial.ttf", 32) if hasattr(ImageFont, 'truetype') else font
-            brand = "💖 SoulVest LoveBook"
-            bw, bh = draw.textsize(brand, font=brand_font)
-            draw.text(((W-bw)//2, H-80), brand, font=brand_font, fill="#fff")
-            # Show and download
-            buf = io.BytesIO()
-            img.save(buf, format="PNG")
-            st.image(buf.getvalue(), caption="Your Shareable Card", use_column_width=True)
-            st.download_button("Download Card Image", data=buf.getvalue(), file_name="lovebook_card.png", mime="image/png")
-
-if dashboard_tab:
-    with dashboard_tab:
-        st.markdown("# 👤 My Dashboard")
-        st.markdown("---")
-        # Profile and Stats Section (HTML removed)
-        import base64
-        from datetime import datetime
-        col1, col2, col3 = st.columns([1, 2, 2])
-        with col1:
-            profile_photo_path = user.get('profile_photo')
-            if profile_photo_path and os.path.exists(profile_photo_path):
-                st.image(profile_photo_path, width=80)
-            else:
-                st.image(VENUE_LOGO, width=80)
-        with col2:
-            name = user.get('name') or user.get('email','Guest').split('@')[0]
-            st.subheader(name)
-            st.caption(user.get('email',''))
-            role = user.get('role','guest').capitalize()
-            st.info(f"{role}")
-        with col3:
-            books_created = user.get('usage_count',0)
-            last_active = user.get('last_active') or datetime.now().strftime('%Y-%m-%d')
-            if books_created > 0:
-                st.caption("Books Created")
-                st.metric(label="", value=books_created)
-            st.caption("Last Active")
-            st.metric(label="", value=last_active)
-        st.markdown("---")
-        # Saved Books Section
-        st.subheader("📚 Your Saved Memory Books")
-        # Sorting/Filtering
-        sort_options = ["Date Created (Newest)", "Date Created (Oldest)", "Alphabetical"]
-        sort_choice = st.selectbox("Sort by:", sort_options, key="sort_books")
-        privacy_toggle = st.checkbox("Show Private Books Only", key="privacy_toggle")
-        books = get_all_books_for_user(user['id'])
-        if books:
-            # Privacy-first: filter private books (simulate with even/odd id)
-            if privacy_toggle:
-                books = [b for b in books if b[0] % 2 == 0]
-            if sort_choice == "Date Created (Newest)":
-                books = sorted(books, key=lambda x: x[3], reverse=True)
-            elif sort_choice == "Date Created (Oldest)":
-                books = sorted(books, key=lambda x: x[3])
-            elif sort_choice == "Alphabetical":
-                books = sorted(books, key=lambda x: (x[2] or '').lower())
-            import random
-            card_cols = st.columns(2)
-            for idx, book in enumerate(books):
-                with card_cols[idx % 2]:
-                    # Thumbnail: use a symbolic cover (emoji or color block)
-                    color = random.choice(['#ffb6b9','#fae3d9','#ff6a88','#b91372','#6c5ce7'])
-                    lock_icon = "🔒" if book[0] % 2 == 0 else ""
-                    st.markdown(f"""
-                    <div style='background:{color};border-radius:16px;padding:18px 16px 12px 16px;margin-bottom:16px;box-shadow:0 2px 8px #f8e1e7;'>
-                        <div style='display:flex;align-items:center;justify-content:space-between;'>
-                            <div style='font-size:2.2rem;'>{lock_icon}📖</div>
-                            <div style='font-size:1.3rem;font-weight:bold;color:#b91372'>{book[2] or 'Untitled Book'}</div>
-                            <div style='position:relative;'>
-                                <span style='font-size:1.5rem;cursor:pointer;' title='More actions'>⋮</span>
-                            </div>
-                        </div>
-                        <div style='color:#636e72;font-size:0.95rem;margin-top:2px;'>Created: {book[3]}</div>
-                        <div style='margin-top:10px;'>
-                            <form action="#" method="post">
-                                <button type="submit" style='background:#b91372;color:#fff;border:none;padding:6px 18px;border-radius:8px;font-size:1rem;cursor:pointer;' name="view_{book[0]}">View</button>
-                            </form>
-                        </div>
-                        <div style='margin-top:8px;font-size:0.95rem;color:#888;'>Your sanctuary grows with you 🌸</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    if st.button(f"View Story", key=f"view_{book[0]}"):
-                        st.session_state.story = book[1]
-                        st.session_state.couple_names = book[2]
-                        st.session_state.story_generated = True
-                        st.success("Loaded your saved book! Go to 'View Your Story' tab.")
+# Day/Night and paging through entries only rerun the viewer
+@fragment
+def book_viewer():
+    # Day/Night mode toggle
+    mode = st.radio("Mode", ["Day", "Night"], horizontal=True, key="book_viewer_mode")
+    bg = "#fff" if mode == "Day" else "#232946"
+    fg = "#b91372" if mode == "Day" else "#eebbc3"
+    st.markdown(f"<div style='background:{bg};padding:32px 18px 32px 18px;border-radius:18px;box-shadow:0 2px 12px #f8e1e7;transition:background 0.5s;'>", unsafe_allow_html=True)
+    st.markdown(":sparkling_heart: <span style='color:{fg};font-size:18px;'>Your story is safe here—ready to be shared, treasured, and celebrated. Love, after all, is the greatest story ever told.</span>", unsafe_allow_html=True)
+    st.markdown("<div style='text-align:center; margin: 0 0 18px 0;'><span style='font-size:18px; color:{fg}; font-family:Georgia,serif; font-style:italic;'>\"Whatever our souls are made of, his and mine are the same.\"<br>– Emily Brontë</span></div>", unsafe_allow_html=True)
+    # Soft animation for flipping entries (simulate with next/prev buttons)
+    story_entries = current_story_model().entries
+    if 'story_page' not in st.session_state:
+        st.session_state.story_page = 0
+    col_prev, col_page, col_next = st.columns([1,2,1])
+    with col_prev:
+        if st.button('⬅️', key='prev_entry'):
+            st.session_state.story_page = max(0, st.session_state.story_page-1)
+    with col_next:
+        if st.button('➡️', key='next_entry'):
+            st.session_state.story_page = min(max(len(story_entries)-1, 0), st.session_state.story_page+1)
+    with col_page:
+        st.markdown(f"<div style='text-align:center;color:{fg};font-size:1.2rem;'>Entry {st.session_state.story_page+1} of {len(story_entries)}</div>", unsafe_allow_html=True)
+    if story_entries:
+        st.session_state.story_page = min(st.session_state.story_page, len(story_entries)-1)
+        st.markdown(f"<div style='color:{fg};font-size:1.2rem;min-height:120px;transition:color 0.5s;'>{story_entries[st.session_state.story_page]}</div>", unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# The card form reruns on its own; the book, PDF and audio sections stay as they are
+@fragment
+def share_card_generator():
+    default_card_text = current_story_model().title or "Love is all we need."
+    card_text = st.text_area("Your favorite memory or quote", value=default_card_text, max_chars=180, height=80, key="card_text")
+    card_bg_color = st.color_picker("Card background color", value="#ffb6b9", key="card_bg_color")
+    card_text_color = st.color_picker("Text color", value="#b91372", key="card_text_color")
+    card_template = st.selectbox("Card layout", list(CARD_TEMPLATES), format_func=lambda t: CARD_TEMPLATES[t]["label"], key="card_template")
+    if st.button("Generate Card Image", key="generate_card_img"):
+        try:
+            card_png = get_render_service().get_or_render("card", card_text, card_bg_color, card_text_color, card_template)
+        except (QueueFull, RuntimeError) as e:
+            st.error(f"Card generation failed: {e}")
         else:
-            st.info("No saved books yet. Create your first memory book!")
-        st.markdown("---")
-    st.markdown("---")
-    st.markdown("### 🎧 Download Your Story as Audio (MP3)")
-    st.markdown("<span style='color:#b91372;'>Generate an MP3 audio file of your story to listen anytime. Choose from multiple voice styles for a personalized experience!</span>", unsafe_allow_html=True)
-    import tempfile
-    import asyncio
-    import os
-    os.environ["EDGE_TTS_DISABLE_CERT_VERIFY"] = "1"  # Disable SSL verification for edge-tts (testing only)
-    try:
-        import edge_tts
-        edge_tts_available = True
-    except ImportError as e:
-        edge_tts_available = False
+            st.session_state.card_handle = get_session_store().put(st.session_state.session_id, "card", card_png)
+    # Show and download from the on-disk store
+    card_handle = st.session_state.get('card_handle')
+    if get_session_store().exists(card_handle):
+        st.image(get_session_store().path(card_handle), caption="Your Shareable Card", use_column_width=True)
+        st.download_button("Download Card Image", data=partial(get_session_store().read, card_handle), file_name="lovebook_card.png", mime="image/png")
+    # Whole carousel: one card per page, rendered in parallel into a ZIP on disk
+    if st.button("🗂️ Make a card for every page", key="generate_card_zip"):
+        store = get_session_store()
+        zip_path = store.spool()
+        cards = book_cards(current_story_model(), card_bg_color, card_text_color, card_template)
+        try:
+            with st.spinner(f"Drawing {len(cards)} cards... 🎨"):
+                write_card_zip(zip_path, get_render_service(), cards)
+        except (QueueFull, RuntimeError) as e:
+            os.remove(zip_path)
+            st.error(f"Card generation failed: {e}")
+        else:
+            st.session_state.card_zip_handle = store.put_file(st.session_state.session_id, "card_zip", zip_path)
+    card_zip_handle = st.session_state.get('card_zip_handle')
+    if get_session_store().exists(card_zip_handle):
+        st.download_button("Download All Cards (ZIP)", data=partial(get_session_store().read, card_zip_handle), file_name="lovebook_cards.zip", mime="application/zip")
+
+def tts_pending(job):
+    return job is not None and job.status not in (TTS_DONE, TTS_FAILED)
+
+
+# Story audio, polled without rerunning the rest of the page while parts are synthesized
+def audio_panel(polling):
     voice_options = {
         "Romantic Female (Aria)": "en-US-AriaNeural",
         "Romantic Male (Guy)": "en-US-GuyNeural",
@@ -1322,158 +899,145 @@ if dashboard_tab:
         "Narrator (Amber)": "en-US-AmberNeural"
     }
     selected_voice = st.selectbox("Choose a voice style for your audio:", list(voice_options.keys()), index=0)
-    def story_to_mp3(text, voice):
-        try:
-            async def _gen():
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tts_fp:
-                    communicate = edge_tts.Communicate(text, voice)
-                    await communicate.save(tts_fp.name)
-                    with open(tts_fp.name, "rb") as f:
-                        return f.read()
-            return asyncio.run(_gen())
-        except Exception as e:
-            st.error(f"Audio generation failed: {e}")
-            return None
+    tts_service = get_tts_service()
     if st.button("🎵 Generate MP3 Audio", key="download_story_mp3"):
         thank_you_note = "\n\nThanks for using our SoulVest Love Book. Have a great day with your partner!"
         story_with_thanks = st.session_state.story + thank_you_note
-        if not edge_tts_available:
+        if tts_service is None:
             st.error("Audio generation failed. The edge-tts package is not installed or not available in this environment.")
+        elif KIOSK_MODE and tts_service.queued_count() >= KIOSK_MAX_TTS_QUEUED:
+            st.warning("Our narrators are busy right now. Please try again in a minute! 💖")
         else:
-            audio_bytes = story_to_mp3(story_with_thanks, voice_options[selected_voice])
-            if audio_bytes:
+            st.session_state.tts_job_id = tts_service.submit(story_with_thanks, voice_options[selected_voice]).id
+            st.session_state.tts_part = 0
+    tts_job = tts_service.get(st.session_state.get('tts_job_id')) if tts_service else None
+    if tts_job is not None and tts_job.status == TTS_DONE and not os.path.exists(tts_job.path):
+        # The spool was evicted after its grace period; Generate makes it again
+        st.session_state.tts_job_id = tts_job = None
+        st.info("Your audio has expired. Generate it again to listen. 🎧")
+    if polling != tts_pending(tts_job):
+        # Started or finished: rerun the page once so this panel polls only while needed
+        st.rerun()
+    if tts_job is not None:
+        if tts_job.status == TTS_FAILED:
+            st.error(f"Audio generation failed: {tts_job.error}")
+        else:
+            # Play part by part as parts are synthesized; only one part is held in memory per session
+            ready_parts = tts_job.ready_chunks()
+            if ready_parts:
+                part = min(st.session_state.get('tts_part', 0), len(ready_parts) - 1)
+                col_prev_part, col_part, col_next_part = st.columns([1,2,1])
+                with col_prev_part:
+                    if st.button("⏮️ Previous part", key="tts_prev_part", disabled=part == 0):
+                        part -= 1
+                with col_next_part:
+                    if st.button("Next part ⏭️", key="tts_next_part", disabled=part >= len(ready_parts) - 1):
+                        part += 1
+                st.session_state.tts_part = part
+                with col_part:
+                    st.caption(f"Part {part+1} of {tts_job.total_chunks}")
+                st.audio(ready_parts[part], format="audio/mp3")
+            if tts_job.status == TTS_DONE:
                 st.download_button(
                     label="📥 Download Story Audio (MP3)",
-                    data=audio_bytes,
+                    # Read from the spool only when the user actually downloads
+                    data=partial(Path(tts_job.path).read_bytes),
                     file_name="memory_book_story.mp3",
                     mime="audio/mp3"
                 )
-            # If error already shown in story_to_mp3, don't repeat
-
-        if st.session_state.story_generated:
-            # Immersive Book Viewer
-            st.markdown(f"## 📖 {st.session_state.couple_names}")
-            if st.session_state.start_date:
-                st.markdown(f"*Since {st.session_state.start_date.strftime('%B %d, %Y')}*")
-
-            # Day/Night mode toggle
-            mode = st.radio("Mode", ["Day", "Night"], horizontal=True, key="book_viewer_mode")
-            bg = "#fff" if mode == "Day" else "#232946"
-            fg = "#b91372" if mode == "Day" else "#eebbc3"
-            st.markdown(f"<div style='background:{bg};padding:32px 18px 32px 18px;border-radius:18px;box-shadow:0 2px 12px #f8e1e7;transition:background 0.5s;'>", unsafe_allow_html=True)
-            st.markdown(":sparkling_heart: <span style='color:{fg};font-size:18px;'>Your story is safe here—ready to be shared, treasured, and celebrated. Love, after all, is the greatest story ever told.</span>", unsafe_allow_html=True)
-            st.markdown("<div style='text-align:center; margin: 0 0 18px 0;'><span style='font-size:18px; color:{fg}; font-family:Georgia,serif; font-style:italic;'>\"Whatever our souls are made of, his and mine are the same.\"<br>– Emily Brontë</span></div>", unsafe_allow_html=True)
-            # Soft animation for flipping entries (simulate with next/prev buttons)
-            story_entries = st.session_state.story.split('\n\n') if st.session_state.story else []
-            if 'story_page' not in st.session_state:
-                st.session_state.story_page = 0
-            col_prev, col_page, col_next = st.columns([1,2,1])
-            with col_prev:
-                if st.button('⬅️', key='prev_entry'):
-                    st.session_state.story_page = max(0, st.session_state.story_page-1)
-            with col_next:
-                if st.button('➡️', key='next_entry'):
-                    st.session_state.story_page = min(len(story_entries)-1, st.session_state.story_page+1)
-            with col_page:
-                st.markdown(f"<div style='text-align:center;color:{fg};font-size:1.2rem;'>Entry {st.session_state.story_page+1} of {len(story_entries)}</div>", unsafe_allow_html=True)
-            if story_entries:
-                st.markdown(f"<div style='color:{fg};font-size:1.2rem;min-height:120px;transition:color 0.5s;'>{story_entries[st.session_state.story_page]}</div>", unsafe_allow_html=True)
-            st.markdown("</div>", unsafe_allow_html=True)
-            st.markdown("---")
-        from fpdf import FPDF
-        import io
-
-        def create_pdf(title, story, bg_image=None):
-            def create_certificate_pdf(names, date=None):
-                from fpdf import FPDF
-                import io
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_font("Arial", 'B', 28)
-                pdf.set_text_color(185, 19, 114)
-                pdf.cell(0, 30, "Certificate of Love", ln=True, align='C')
-                pdf.ln(10)
-                pdf.set_font("Arial", '', 18)
-                pdf.set_text_color(0, 0, 0)
-                pdf.multi_cell(0, 14, f"This certifies that\n\n{names}\n\nhave created a beautiful LoveBook together\n\n", align='C')
-                if date:
-                    pdf.set_font("Arial", 'I', 14)
-                    pdf.cell(0, 10, f"Date: {date}", ln=True, align='C')
-                pdf.ln(20)
-                pdf.set_font("Arial", 'I', 12)
-                pdf.set_text_color(185, 19, 114)
-                pdf.cell(0, 10, "— SoulVest LoveBook", ln=True, align='R')
-                return pdf.output(dest='S')
-                # Certificate download option
-                if st.session_state.story_generated and st.session_state.couple_names:
-                    cert_pdf = create_certificate_pdf(st.session_state.couple_names, datetime.now().strftime('%B %d, %Y'))
-                    if isinstance(cert_pdf, bytearray):
-                        cert_pdf = bytes(cert_pdf)
-                    st.download_button(
-                        label="📜 Download LoveBook Certificate (PDF)",
-                        data=cert_pdf,
-                        file_name="lovebook_certificate.pdf",
-                        mime="application/pdf"
-                    )
-                    # Certificate download in dashboard
-                    if user.get('couple_names'):
-                        cert_pdf = create_certificate_pdf(user['couple_names'], datetime.now().strftime('%B %d, %Y'))
-                        if isinstance(cert_pdf, bytearray):
-                            cert_pdf = bytes(cert_pdf)
-                        st.download_button(
-                            label="📜 Download LoveBook Certificate (PDF)",
-                            data=cert_pdf,
-                            file_name="lovebook_certificate.pdf",
-                            mime="application/pdf"
-                        )
-            pdf = FPDF()
-            pdf.add_page()
-            from PIL import Image
-            import tempfile
-            import os
-            # Use uploaded image or default love theme
-            if bg_image is not None:
-                img = Image.open(bg_image)
+            elif tts_service.queue_position(tts_job):
+                st.info(f"Your audio is number {tts_service.queue_position(tts_job)} in line... ⏳")
             else:
-                # Use a default love theme image (hearts and roses)
-                default_img_path = os.path.join(os.path.dirname(__file__), "default-love_bg.jpg")
-                img = Image.open(default_img_path)
-            # Resize image to fit A4 (210x297mm, 1pt=0.3528mm, so 595x842pt)
-            img = img.convert('RGB')
-            img = img.resize((595, 842))
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmpfile:
-                img.save(tmpfile, format='JPEG')
-                tmpfile.flush()
-                pdf.image(tmpfile.name, x=0, y=0, w=210, h=297)
-            pdf.set_font("Arial", 'B', 18)
-            pdf.set_text_color(185, 19, 114)
-            pdf.cell(0, 10, title, ln=True, align='C')
-            pdf.ln(10)
-            pdf.set_font("Arial", '', 12)
-            pdf.set_text_color(0, 0, 0)
-            for line in story.split('\n'):
-                line = line.strip()
-                if line:
-                    pdf.multi_cell(0, 8, line)
-                else:
-                    pdf.ln(4)
-            # Add signature at the end
-            pdf.ln(8)
-            pdf.set_font("Arial", 'I', 12)
-            pdf.set_text_color(185, 19, 114)
-            pdf.cell(0, 10, "- Made with SoulVest Memory Book (Love)", ln=True, align='R')
-            return pdf.output(dest='S')
-
-        pdf_bytes = create_pdf(f"{st.session_state.couple_names} - Memory Book", st.session_state.story, uploaded_bg)
-        if isinstance(pdf_bytes, bytearray):
-            pdf_bytes = bytes(pdf_bytes)
+                st.progress(tts_job.progress, text=f"Recording your story... {tts_job.done_chunks}/{tts_job.total_chunks} parts")
+
+
+def render_pending(job):
+    return job is not None and job.status not in (RENDER_DONE, RENDER_FAILED)
+
+
+def current_pdf_job(pdf_args):
+    """This session's PDF job, if it was for these inputs."""
+    job = get_render_service().get(st.session_state.get('pdf_job_id'))
+    return job if job is not None and job.key == render_key("pdf", *pdf_args) else None
+
+
+# PDF status, polled without rerunning the rest of the page while a render is pending
+def pdf_panel(pdf_args, polling):
+    renders = get_render_service()
+    pdf_bytes = renders.cache.get(render_key("pdf", *pdf_args))
+    pdf_job = current_pdf_job(pdf_args)
+    if polling and not render_pending(pdf_job):
+        # Finished: rerun the page once so this panel stops polling
+        st.rerun()
+    if pdf_bytes is None:
+        if pdf_job is not None and pdf_job.status == RENDER_FAILED:
+            st.error(f"PDF generation failed: {pdf_job.error}")
+        if not render_pending(pdf_job) and st.button("📄 Prepare PDF", key="prepare_pdf"):
+            try:
+                pdf_job = renders.submit("pdf", *pdf_args)
+                st.session_state.pdf_job_id = pdf_job.id
+                # Most books are ready within a second; longer ones are polled
+                pdf_bytes = renders.wait(pdf_job, timeout=1)
+                if pdf_bytes is None and render_pending(pdf_job):
+                    st.rerun()
+            except QueueFull:
+                st.warning("Lots of books are being printed right now. Please try again in a minute! 💖")
+        if pdf_bytes is None and render_pending(pdf_job):
+            position = renders.position(pdf_job)
+            st.info(f"Your PDF is number {position} in line... ⏳" if position else "Preparing your PDF... 📖")
+    if pdf_bytes is not None:
         st.download_button(
             label="📥 Download Memory Book as PDF",
-            data=pdf_bytes,
+            # Fetched from the shared cache on click instead of pinned per session
+            data=partial(renders.get_or_render, "pdf", *pdf_args),
             file_name="memory_book.pdf",
             mime="application/pdf"
         )
 
+
+with tab2:
+    # ...existing code for View Your Story...
+    # --- Shareable Love Story Card Section (moved here) ---
+    if st.session_state.get('story_generated') and st.session_state.story:
+        st.markdown("---")
+        st.subheader("💌 Create a Shareable Love Story Card")
+        st.caption("Pick your favorite memory or quote and turn it into a beautiful image to share on WhatsApp, Instagram, or anywhere!")
+        if on_demand("share_card", "🎨 Design my card"):
+            share_card_generator()
+    st.markdown("---")
+    st.markdown("### 🎧 Download Your Story as Audio (MP3)")
+    st.markdown("<span style='color:#b91372;'>Generate an MP3 audio file of your story to listen anytime. Choose from multiple voice styles for a personalized experience!</span>", unsafe_allow_html=True)
+    if on_demand("audio", "🎧 Make an audio version of my story"):
+        os.environ["EDGE_TTS_DISABLE_CERT_VERIFY"] = "1"  # Disable SSL verification for edge-tts (testing only)
+        tts_service = get_tts_service()
+        tts_job = tts_service.get(st.session_state.get('tts_job_id')) if tts_service else None
+        polling_fragment(audio_panel, tts_pending(tts_job))(tts_pending(tts_job))
+
+    if st.session_state.story_generated:
+        # Immersive Book Viewer
+        st.markdown(f"## 📖 {st.session_state.couple_names}")
+        if st.session_state.start_date:
+            st.markdown(f"*Since {st.session_state.start_date.strftime('%B %d, %Y')}*")
+
+        book_viewer()
+        st.markdown("---")
+        # --- PDF export (rendered on demand in the render service, cached by content) ---
+        pdf_args = (f"{st.session_state.couple_names} - Memory Book", st.session_state.story,
+                    uploaded_bg.getvalue() if uploaded_bg is not None else None)
+        renders = get_render_service()
+        pdf_pending = render_pending(current_pdf_job(pdf_args))
+        polling_fragment(pdf_panel, pdf_pending)(pdf_args, pdf_pending)
+        # Only the names and date are stamped onto a pre-drawn frame, so this is ready at once
+        from datetime import datetime
+        certificate_args = (st.session_state.couple_names, datetime.now().strftime('%B %d, %Y'), VENUE_BRAND)
+        st.download_button(
+            label="🏅 Download Certificate of Love",
+            data=partial(renders.get_or_render, "certificate", *certificate_args),
+            file_name="certificate_of_love.pdf",
+            mime="application/pdf",
+            key="download_certificate"
+        )
+
         # --- Viral Share Section ---
         st.markdown("### 💝 Share Your Love Story with the World")
         st.markdown("<span style='color:#b91372;'>Let your love inspire others—share your story on WhatsApp, Facebook, or Instagram! Make this Valentine's Day unforgettable for you and your beloved.</span>", unsafe_allow_html=True)
@@ -1499,6 +1063,12 @@ if dashboard_tab:
 
         if st.button("🔄 Create New Book"):
             st.session_state.story_generated = False
+            if user.get('id') is not None:
+                get_draft_store().discard(user['id'])
+            st.session_state.book_id = None
+            st.session_state.card_handle = st.session_state.card_zip_handle = None
+            get_session_store().discard(st.session_state.session_id, "card")
+            get_session_store().discard(st.session_state.session_id, "card_zip")
             st.rerun()
     else:
         st.info("📝 Fill in your memories in the 'Create Memory Book' tab first!")
@@ -1515,6 +1085,125 @@ if dashboard_tab:
         Start creating your memory book now! →
         """)
 
+
+def set_book_private(user_id, book_id, private):
+    with get_db() as conn:
+        set_private(conn, user_id, book_id, private)
+
+# Sorting, filtering, paging and privacy toggles only rerun the saved-books grid;
+# button actions run as callbacks so the grid renders their result in the same run
+@fragment
+def saved_books_grid(user):
+    st.subheader("📚 Your Saved Memory Books")
+    if st.session_state.pop('book_loaded', False):
+        st.success("Loaded your saved book! Go to 'View Your Story' tab.")
+    # Sorting/Filtering
+    sort_options = {"Date Created (Newest)": "newest", "Date Created (Oldest)": "oldest", "Alphabetical": "title"}
+    sort_choice = st.selectbox("Sort by:", list(sort_options), key="sort_books")
+    privacy_toggle = st.checkbox("Show Private Books Only", key="privacy_toggle")
+    with get_db() as conn:
+        total_books = count_books(conn, user['id'], private_only=privacy_toggle)
+        page_count = max(1, -(-total_books // BOOKS_PER_PAGE))
+        books_page = min(st.session_state.get('books_page', 0), page_count - 1)
+        books = list_books(
+            conn, user['id'], sort=sort_options[sort_choice], private_only=privacy_toggle,
+            limit=BOOKS_PER_PAGE, offset=books_page * BOOKS_PER_PAGE
+        )
+        # Only public books can be opened from a share link
+        share_tokens = {b[0]: share_token(conn, user['id'], b[0]) for b in books if not b[4]}
+    if books:
+        import random
+        card_cols = st.columns(2)
+        share_qrs = bulk_qr_png(book_share_url(token) for token in share_tokens.values())
+        for idx, book in enumerate(books):
+            book_id, title, couple_names, created_at, is_private, word_count = book
+            with card_cols[idx % 2]:
+                # Thumbnail: use a symbolic cover (emoji or color block)
+                color = random.choice(['#ffb6b9','#fae3d9','#ff6a88','#b91372','#6c5ce7'])
+                lock_icon = "🔒" if is_private else ""
+                st.markdown(f"""
+                <div style='background:{color};border-radius:16px;padding:18px 16px 12px 16px;margin-bottom:16px;box-shadow:0 2px 8px #f8e1e7;'>
+                    <div style='display:flex;align-items:center;justify-content:space-between;'>
+                        <div style='font-size:2.2rem;'>{lock_icon}📖</div>
+                        <div style='font-size:1.3rem;font-weight:bold;color:#b91372'>{title or 'Untitled Book'}</div>
+                        <div style='position:relative;'>
+                            <span style='font-size:1.5rem;cursor:pointer;' title='More actions'>⋮</span>
+                        </div>
+                    </div>
+                    <div style='color:#636e72;font-size:0.95rem;margin-top:2px;'>Created: {created_at}</div>
+                    <div style='margin-top:8px;font-size:0.95rem;color:#888;'>Your sanctuary grows with you 🌸</div>
+                </div>
+                """, unsafe_allow_html=True)
+                with st.expander("Share QR"):
+                    if is_private:
+                        st.caption("Make this book public to share it with a QR code.")
+                    else:
+                        st.image(share_qrs[book_share_url(share_tokens[book_id])], caption="Scan to open this book", width=160)
+                view_col, privacy_col = st.columns(2)
+                with view_col:
+                    if st.button(f"View Story", key=f"view_{book_id}"):
+                        with get_db() as conn:
+                            saved = get_book(conn, user['id'], book_id)
+                        if saved:
+                            st.session_state.story = saved[3] or ""
+                            st.session_state.couple_names = saved[2] or ""
+                            st.session_state.book_id = book_id
+                            st.session_state.story_generated = True
+                            # The View tab lives outside this fragment
+                            st.session_state.book_loaded = True
+                            st.rerun()
+                with privacy_col:
+                    st.button(
+                        "Make Public" if is_private else "Make Private", key=f"privacy_{book_id}",
+                        on_click=set_book_private, args=(user['id'], book_id, not is_private)
+                    )
+        if page_count > 1:
+            col_prev_books, col_books_page, col_next_books = st.columns([1,2,1])
+            with col_prev_books:
+                st.button("⬅️ Previous", key="books_prev", disabled=books_page == 0,
+                          on_click=st.session_state.update, kwargs={"books_page": books_page - 1})
+            with col_next_books:
+                st.button("Next ➡️", key="books_next", disabled=books_page >= page_count - 1,
+                          on_click=st.session_state.update, kwargs={"books_page": books_page + 1})
+            with col_books_page:
+                st.caption(f"Page {books_page+1} of {page_count} · {total_books} books")
+    else:
+        st.info("No saved books yet. Create your first memory book!")
+
+if dashboard_tab:
+    with dashboard_tab:
+        st.markdown("# 👤 My Dashboard")
+        st.markdown("---")
+        # Profile and Stats Section (HTML removed)
+        import base64
+        from datetime import datetime
+        col1, col2, col3 = st.columns([1, 2, 2])
+        with col1:
+            profile_photo_path = user.get('profile_photo')
+            if profile_photo_path and os.path.exists(profile_photo_path):
+                st.image(profile_photo_path, width=80)
+            else:
+                st.image(VENUE_LOGO, width=80)
+        with col2:
+            name = user.get('name') or user.get('email','Guest').split('@')[0]
+            st.subheader(name)
+            st.caption(user.get('email',''))
+            role = user.get('role','guest').capitalize()
+            st.info(f"{role}")
+        with col3:
+            books_created = user.get('usage_count',0)
+            last_active = user.get('last_active') or datetime.now().strftime('%Y-%m-%d')
+            if books_created > 0:
+                st.caption("Books Created")
+                st.metric(label="", value=books_created)
+            st.caption("Last Active")
+            st.metric(label="", value=last_active)
+        st.markdown("---")
+        # Saved Books Section
+        saved_books_grid(user)
+        st.markdown("---")
+
+
 # Footer
 st.markdown("---")
     # --- Freemium Model Notice ---
@@ -1545,33 +1234,18 @@ st.markdown("""
 st.markdown("---")
 st.markdown("## 💬 We value your feedback!")
 st.markdown("<span style='color:#b91372;'>Share your suggestions, ideas, or report any issues below. Help us make SoulVest Memory Book even better!</span>", unsafe_allow_html=True)
-with st.form("feedback_form"):
-    feedback_name = st.text_input("Your Name (optional)")
-    feedback_email = st.text_input("Your Email (optional)")
-    feedback_message = st.text_area("Your Feedback", placeholder="Share your thoughts, suggestions, or report any issues...")
-    submitted = st.form_submit_button("Submit Feedback")
-    if submitted and feedback_message:
-        try:
-            with open("feedback.txt", "a", encoding="utf-8") as f:
-                f.write(f"Name: {feedback_name}\nEmail: {feedback_email}\nMessage: {feedback_message}\n---\n")
-            st.success("Thank you for your feedback! 💖")
-        except Exception as e:
-            st.error(f"Error saving feedback: {str(e)}")
-    elif submitted:
-        st.warning("Please enter your feedback before submitting.")
-
-def get_db():
-    conn = sqlite3.connect("lovebook.db", check_same_thread=False)
-    conn.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        email TEXT UNIQUE,
-        password_hash TEXT,
-        role TEXT DEFAULT 'free',
-        usage_count INTEGER DEFAULT 0,
-        story TEXT,
-        couple_names TEXT,
-        profile_photo TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    return conn
+if on_demand("feedback", "💬 Leave feedback"):
+    with st.form("feedback_form"):
+        feedback_name = st.text_input("Your Name (optional)")
+        feedback_email = st.text_input("Your Email (optional)")
+        feedback_message = st.text_area("Your Feedback", placeholder="Share your thoughts, suggestions, or report any issues...")
+        submitted = st.form_submit_button("Submit Feedback")
+        if submitted and feedback_message:
+            try:
+                with open("feedback.txt", "a", encoding="utf-8") as f:
+                    f.write(f"Name: {feedback_name}\nEmail: {feedback_email}\nMessage: {feedback_message}\n---\n")
+                st.success("Thank you for your feedback! 💖")
+            except Exception as e:
+                st.error(f"Error saving feedback: {str(e)}")
+        elif submitted:
+            st.warning("Please enter your feedback before submitting.")
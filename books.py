@@ -0,0 +1,100 @@
+# --- Memory books: one row per book, one row per page ---
+# Replaces reading the single story stored on the users row. Dashboard queries
+# are ordered, filtered and paged in SQL using the (user_id, created_at) and
+# (user_id, title) indexes, and never load story text for the grid.
+# Public books can be opened by anyone holding their share token (the ?book=
+# link behind a book's QR code); tokens are random, not the sequential id.
+
+import secrets
+
+SORT_ORDERS = {
+    "newest": "created_at DESC, id DESC",
+    "oldest": "created_at ASC, id ASC",
+    "title": "title COLLATE NOCASE ASC, id ASC",
+}
+
+
+def save_book(conn, user_id, model, couple_names, book_id=None, is_private=True):
+    """Insert (or, with ``book_id``, update) a book and its pages; returns the book id."""
+    title = couple_names or "Untitled Book"
+    if book_id is not None:
+        cur = conn.execute(
+            "UPDATE books SET title=?, couple_names=?, story=?, word_count=?, "
+            "updated_at=CURRENT_TIMESTAMP WHERE id=? AND user_id=?",
+            (title, couple_names, model.text, model.word_count, book_id, user_id)
+        )
+        if cur.rowcount == 0:
+            book_id = None
+        else:
+            conn.execute("DELETE FROM pages WHERE book_id=?", (book_id,))
+    if book_id is None:
+        cur = conn.execute(
+            "INSERT INTO books (user_id, title, couple_names, story, word_count, is_private) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, title, couple_names, model.text, model.word_count, int(is_private))
+        )
+        book_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO pages (book_id, page_no, question_key, question, answer) VALUES (?, ?, ?, ?, ?)",
+        [(book_id, p.number, p.key, p.question, p.answer) for p in model.pages]
+    )
+    return book_id
+
+
+def _where(private_only):
+    return "WHERE user_id=?" + (" AND is_private=1" if private_only else "")
+
+
+def list_books(conn, user_id, sort="newest", private_only=False, limit=6, offset=0):
+    """One page of ``(id, title, couple_names, created_at, is_private, word_count)`` rows."""
+    order = SORT_ORDERS[sort]
+    cur = conn.execute(
+        "SELECT id, title, couple_names, created_at, is_private, word_count FROM books "
+        f"{_where(private_only)} ORDER BY {order} LIMIT ? OFFSET ?",
+        (user_id, limit, offset)
+    )
+    return cur.fetchall()
+
+
+def count_books(conn, user_id, private_only=False):
+    cur = conn.execute(f"SELECT COUNT(*) FROM books {_where(private_only)}", (user_id,))
+    return cur.fetchone()[0]
+
+
+def get_book(conn, user_id, book_id):
+    """``(id, title, couple_names, story, is_private)`` or None."""
+    cur = conn.execute(
+        "SELECT id, title, couple_names, story, is_private FROM books WHERE id=? AND user_id=?",
+        (book_id, user_id)
+    )
+    return cur.fetchone()
+
+
+def set_private(conn, user_id, book_id, is_private):
+    conn.execute(
+        "UPDATE books SET is_private=? WHERE id=? AND user_id=?",
+        (int(is_private), book_id, user_id)
+    )
+
+
+def share_token(conn, user_id, book_id):
+    """The book's share token, created on first use; None if the book is not the user's."""
+    row = conn.execute("SELECT share_token FROM books WHERE id=? AND user_id=?", (book_id, user_id)).fetchone()
+    if row is None or row[0]:
+        return row and row[0]
+    conn.execute(
+        "UPDATE books SET share_token=? WHERE id=? AND user_id=? AND share_token IS NULL",
+        (secrets.token_urlsafe(16), book_id, user_id)
+    )
+    return conn.execute("SELECT share_token FROM books WHERE id=?", (book_id,)).fetchone()[0]
+
+
+def get_shared_book(conn, token):
+    """``(id, title, couple_names, story)`` of the public book with this share token, or None."""
+    if not token:
+        return None
+    cur = conn.execute(
+        "SELECT id, title, couple_names, story FROM books WHERE share_token=? AND is_private=0",
+        (token,)
+    )
+    return cur.fetchone()
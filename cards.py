@@ -0,0 +1,269 @@
+# --- Shareable Love Story Card images ---
+# Fonts are loaded once per process and per size, text is wrapped to the
+# template's width using real glyph measurements (textbbox) and the wrapped
+# layout is cached by (text, font, size, width). Text too long for the
+# template's box is set smaller, then cut off with an ellipsis. Each template's
+# blank card is drawn once per background colour, and finished cards are kept as encoded
+# PNG/WebP bytes in an LRU, so generating the same card again costs nothing.
+# write_card_zip() renders a card per story page in parallel and streams them
+# into a ZIP file (an Instagram carousel in one download).
+# Rendered through the render service (render_service.py), so this module must
+# stay importable without Streamlit.
+
+import io
+import zipfile
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont, features
+
+# U+2665 rather than an emoji, which card fonts do not carry
+BRAND = "♥ SoulVest LoveBook"
+CARD_CACHE_ENTRIES = 128
+# Blank cards are full RGB images (a story card is about 6 MB), so only a few are kept
+BLANK_CACHE_ENTRIES = 4
+
+# Tried in order; the first one installed wins, Pillow's built-in font otherwise
+FONTS = {
+    "sans": ("arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"),
+    "sans-bold": ("arialbd.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"),
+    "serif": ("georgia.ttf", "DejaVuSerif.ttf", "LiberationSerif-Regular.ttf"),
+    "serif-bold": ("georgiab.ttf", "DejaVuSerif-Bold.ttf", "LiberationSerif-Bold.ttf"),
+}
+
+# name -> layout; ``text_box`` is (left, top, right, bottom) of the quote area
+TEMPLATES = {
+    "classic": {
+        "label": "Classic (720×900)",
+        "size": (720, 900),
+        "font": ("sans", 48),
+        "text_box": (40, 300, 680, 800),
+        "valign": "top",
+        "caption": ("sans", 28),
+        "brand": ("sans", 32, "#fff"),
+        "border": None,
+    },
+    "square": {
+        "label": "Instagram post (1080×1080)",
+        "size": (1080, 1080),
+        "font": ("serif-bold", 64),
+        "text_box": (120, 120, 960, 900),
+        "valign": "middle",
+        "caption": ("sans", 34),
+        "brand": ("serif", 36, None),
+        "border": 28,
+    },
+    "story": {
+        "label": "Instagram story (1080×1920)",
+        "size": (1080, 1920),
+        "font": ("serif-bold", 72),
+        "text_box": (110, 300, 970, 1600),
+        "valign": "middle",
+        "caption": ("sans", 40),
+        "brand": ("sans-bold", 44, None),
+        "border": 36,
+    },
+}
+DEFAULT_TEMPLATE = "classic"
+
+if features.check("webp"):
+    FORMATS = {"PNG": ({"optimize": False}, "image/png"), "WEBP": ({"quality": 90, "method": 4}, "image/webp")}
+else:
+    FORMATS = {"PNG": ({"optimize": False}, "image/png")}
+
+_LINE_SPACING = 10
+_CAPTION_GAP = 36
+# Text that does not fit its box shrinks in these steps, down to this share of the template's size
+_FONT_STEP = 4
+_MIN_FONT_SCALE = 0.5
+
+
+@lru_cache(maxsize=None)
+def font(style, size):
+    """A loaded font for ``style`` at ``size`` px, cached for the whole process."""
+    for name in FONTS[style]:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=1024)
+def layout(text, style, size, max_width):
+    """Wrap ``text`` to ``max_width`` px; returns ((line, width, height), ...)."""
+    face = font(style, size)
+    measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+    def bbox(s):
+        left, top, right, bottom = measure.textbbox((0, 0), s, font=face)
+        return right - left, bottom - top
+
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        current = ""
+        for word in paragraph.split():
+            candidate = f"{current} {word}".strip()
+            width = bbox(candidate)[0]
+            if current and width > max_width:
+                lines.append(current)
+                current = word
+                width = bbox(word)[0]
+            else:
+                current = candidate
+            if width <= max_width:
+                continue
+            # A word wider than the line on its own (a URL, a run of emoji, a
+            # script without spaces) is broken between characters. The prefix
+            # that fits is found by doubling, then bisection, so a long word is
+            # never measured whole again.
+            while len(current) > 1:
+                end = 2
+                while end < len(current) and bbox(current[:end])[0] <= max_width:
+                    end *= 2
+                if end >= len(current) and bbox(current)[0] <= max_width:
+                    break
+                lo, hi = max(1, end // 2), min(end, len(current)) - 1
+                while lo < hi:
+                    mid = (lo + hi + 1) // 2
+                    if bbox(current[:mid])[0] <= max_width:
+                        lo = mid
+                    else:
+                        hi = mid - 1
+                lines.append(current[:lo])
+                current = current[lo:]
+        lines.append(current)
+    # Line height from the font, so lines without ascenders do not squash together
+    line_height = bbox("Ag")[1]
+    return tuple((line, bbox(line)[0] if line else 0, line_height) for line in lines)
+
+
+@lru_cache(maxsize=BLANK_CACHE_ENTRIES)
+def _blank(template, bg_color, text_color):
+    spec = TEMPLATES[template]
+    img = Image.new("RGB", spec["size"], bg_color)
+    draw = ImageDraw.Draw(img)
+    w, h = spec["size"]
+    if spec["border"]:
+        inset = spec["border"]
+        draw.rounded_rectangle((inset, inset, w - inset, h - inset), radius=inset * 2,
+                               outline=text_color, width=max(2, inset // 6))
+    style, size, color = spec["brand"]
+    brand_font = font(style, size)
+    bw = draw.textlength(BRAND, font=brand_font)
+    # Branding at the bottom, in the text colour unless the template sets one
+    draw.text(((w - bw) // 2, h - 80 - (spec["border"] or 0)), BRAND, font=brand_font, fill=color or text_color)
+    return img
+
+
+def _block_height(lines):
+    return sum(h for _, _, h in lines) + _LINE_SPACING * (len(lines) - 1)
+
+
+def _fit(text, style, size, max_width, max_height):
+    """``size`` and layout of ``text`` fitted into ``max_width`` x ``max_height`` px.
+
+    The font shrinks in _FONT_STEP steps, down to half of ``size``; text that
+    still does not fit is cut off after the last whole line that does, with an
+    ellipsis.
+    """
+    min_size = max(1, round(size * _MIN_FONT_SCALE))
+    lines = layout(text, style, size, max_width)
+    if _block_height(lines) <= max_height:
+        return size, lines
+    # The largest of the smaller steps that fits, found by bisection
+    sizes = list(range(size - _FONT_STEP, min_size, -_FONT_STEP)) + [min_size]
+    lo, hi = 0, len(sizes) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _block_height(layout(text, style, sizes[mid], max_width)) <= max_height:
+            hi = mid
+        else:
+            lo = mid + 1
+    size = sizes[lo]
+    lines = layout(text, style, size, max_width)
+    if _block_height(lines) <= max_height:
+        return size, lines
+    count = len(lines)
+    while count > 1 and _block_height(lines[:count]) > max_height:
+        count -= 1
+    last = lines[count - 1][0]
+    while True:
+        ellipsized = layout(f"{last.rstrip(' ,.;:')}…", style, size, max_width)
+        if len(ellipsized) == 1 or not last:
+            break
+        last = last.rsplit(" ", 1)[0] if " " in last else last[:-1]
+    return size, lines[:count - 1] + ellipsized[:1]
+
+
+def draw_card(text, bg_color="#ffb6b9", text_color="#b91372", template=DEFAULT_TEMPLATE, caption=None):
+    """The card as a PIL image; ``caption`` is an optional smaller line above the text."""
+    spec = TEMPLATES[template]
+    img = _blank(template, bg_color, text_color).copy()
+    draw = ImageDraw.Draw(img)
+    left, top, right, bottom = spec["text_box"]
+    room = bottom - top
+    blocks = []
+    if caption:
+        style, size = spec["caption"]
+        size, lines = _fit(caption, style, size, right - left, room // 3)
+        blocks.append(((style, size), lines))
+        room -= _block_height(lines) + _CAPTION_GAP
+    # Long answers shrink, then are cut off, so they never run over the branding
+    style, size = spec["font"]
+    size, lines = _fit(text, style, size, right - left, room)
+    blocks.append(((style, size), lines))
+    total = sum(_block_height(lines) for _, lines in blocks) + _CAPTION_GAP * (len(blocks) - 1)
+    y = top if spec["valign"] == "top" else top + max(0, (bottom - top - total) // 2)
+    for (style, size), lines in blocks:
+        face = font(style, size)
+        for line, width, height in lines:
+            draw.text((left + (right - left - width) // 2, y), line, font=face, fill=text_color)
+            y += height + _LINE_SPACING
+        y += _CAPTION_GAP - _LINE_SPACING
+    return img
+
+
+@lru_cache(maxsize=CARD_CACHE_ENTRIES)
+def render_card(text, bg_color="#ffb6b9", text_color="#b91372", template=DEFAULT_TEMPLATE, fmt="PNG", caption=None):
+    """Encoded bytes (``fmt`` is PNG or WEBP) of a card showing ``text``."""
+    options, _ = FORMATS[fmt]
+    buf = io.BytesIO()
+    draw_card(text, bg_color, text_color, template, caption).save(buf, format=fmt, **options)
+    return buf.getvalue()
+
+
+def mime_type(fmt):
+    return FORMATS[fmt][1]
+
+
+def extension(fmt):
+    return ".webp" if fmt == "WEBP" else ".png"
+
+
+def book_cards(model, bg_color, text_color, template=DEFAULT_TEMPLATE, fmt="PNG"):
+    """render_card() arguments for a carousel of ``model``: the title, then one card per answered page."""
+    cards = []
+    if model.title:
+        cards.append((model.title, bg_color, text_color, template, fmt, None))
+    for page in model.pages:
+        if page.answer:
+            cards.append((page.answer, bg_color, text_color, template, fmt, f"Page {page.number}: {page.question}"))
+    return cards
+
+
+def write_card_zip(path, service, cards):
+    """Render ``cards`` (render_card() arguments) in parallel through ``service`` into a ZIP at ``path``.
+
+    Every card is queued at once; each is written into the archive as soon as
+    it and the ones before it are done, so only one image is held here at a time.
+    Returns the number of cards written.
+    """
+    jobs = [service.submit("card", *args) for args in cards]
+    # Images are already compressed, so they are stored as-is
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for index, (job, args) in enumerate(zip(jobs, cards), 1):
+            data = service.wait(job, service.timeout + 5)
+            if data is None:
+                raise RuntimeError(job.error or f"card {index} did not finish")
+            archive.writestr(f"card-{index:02d}{extension(args[4])}", data)
+    return len(jobs)
@@ -0,0 +1,301 @@
+# --- Certificates of Love ---
+# Everything on a certificate except the couple's names and the date (border,
+# hearts, title, wording, branding) is drawn once per process and brand with
+# PIL and saved as a JPEG page background. A certificate is then a one-page PDF
+# of that image with the names and date stamped on top, about ten
+# milliseconds each. The names and date are drawn with PIL in the card fonts,
+# on copies of the bits of the frame they cover, so any script those fonts
+# have prints, not only latin-1. bulk() renders a whole event's CSV of couples
+# in parallel worker processes into a ZIP (or a directory) of PDFs.
+#
+#     python certificates.py --names "Asha & Ravi" --date "February 14, 2026" -o certificate.pdf
+#     python certificates.py --csv couples.csv -o certificates.zip --workers 8
+#
+# The CSV needs a ``names`` column, or ``partner1`` and ``partner2``; an
+# optional ``date`` column overrides --date. Rendered through the render
+# service as well (render_service.py), so this module must stay importable
+# without Streamlit.
+
+import argparse
+import csv
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date
+from functools import lru_cache, partial
+
+from fpdf import FPDF
+from PIL import Image, ImageDraw
+
+from cards import BRAND, FONTS, font
+from pdf_export import _to_bytes
+
+# A4 landscape; the frame is drawn at 150 dpi
+PAGE_MM = (297, 210)
+FRAME_DPI = 150
+# Drawn frames are kept with the app (like static/), not in the shared temp folder
+FRAME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "certificates")
+# Part of every frame's file name; bump it whenever draw_frame() draws something different
+FRAME_VERSION = 2
+# Frames of other brands and versions past this many are deleted, least recently used first
+MAX_FRAMES = 16
+
+ROSE = (185, 19, 114)
+INK = (60, 40, 50)
+PAPER = (255, 248, 243)
+
+# Baselines of the stamped lines, in mm from the top of the page
+NAMES_Y = 96
+DATE_Y = 146
+# Strips of the frame the names and the date are centred on: (left, top, right, bottom) in mm
+NAMES_BOX = (20, NAMES_Y - 20, PAGE_MM[0] - 20, NAMES_Y + 6)
+DATE_BOX = (60, DATE_Y - 13, PAGE_MM[0] - 60, DATE_Y + 4)
+# Long names step down in size, from 40 pt to 20 pt, to stay 10 mm inside their strip
+NAMES_PT = (40, 20)
+DATE_PT = 20
+
+_UNSAFE = re.compile(r"[^\w.-]+")
+# Emoji (outside the Basic Multilingual Plane) and variation selectors, which the card fonts lack
+_EMOJI = re.compile("[\U00010000-\U0010ffff\ufe0e\ufe0f]")
+
+
+def _px(mm):
+    return round(mm * FRAME_DPI / 25.4)
+
+
+def _centered(draw, y, text, face, fill):
+    width = draw.textlength(text, font=face)
+    draw.text(((_px(PAGE_MM[0]) - width) / 2, y), text, font=face, fill=fill)
+
+
+def printable(text):
+    """``text`` with ❤ as ♥ and without other emoji, which the card fonts lack."""
+    return " ".join(_EMOJI.sub(" ", text.replace("\u2764", "♥")).split())
+
+
+def printable_brand(brand):
+    """``brand`` without emoji; one that had them gets a leading heart, like cards.BRAND."""
+    text = printable(brand)
+    if not text:
+        return BRAND
+    if text != " ".join(brand.split()) and "♥" not in text:
+        text = f"♥ {text}"
+    return text
+
+
+def draw_frame(brand=BRAND):
+    """The certificate without names and date, as a PIL image."""
+    w, h = _px(PAGE_MM[0]), _px(PAGE_MM[1])
+    img = Image.new("RGB", (w, h), PAPER)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((40, 40, w - 40, h - 40), outline=ROSE, width=14)
+    draw.rectangle((74, 74, w - 74, h - 74), outline=ROSE, width=3)
+    heart = font("sans-bold", 64)
+    for x, y in ((110, 100), (w - 160, 100), (110, h - 180), (w - 160, h - 180)):
+        draw.text((x, y), "♥", font=heart, fill=ROSE)
+    _centered(draw, _px(28), "Certificate of Love", font("serif-bold", 110), ROSE)
+    _centered(draw, _px(66), "This certifies that", font("serif", 44), INK)
+    # Rule under the names
+    draw.line((_px(60), _px(NAMES_Y + 12), w - _px(60), _px(NAMES_Y + 12)), fill=ROSE, width=3)
+    _centered(draw, _px(112), "have created a beautiful LoveBook together", font("serif", 44), INK)
+    draw.line((_px(108), _px(DATE_Y + 6), w - _px(108), _px(DATE_Y + 6)), fill=INK, width=2)
+    _centered(draw, _px(DATE_Y + 9), "Date", font("sans", 30), INK)
+    _centered(draw, h - _px(30), brand, font("sans-bold", 40), ROSE)
+    return img
+
+
+def frame_path(brand=BRAND):
+    """Path of the frame JPEG for ``brand``, drawn on first use and shared by later processes."""
+    brand = printable_brand(brand)
+    path = os.path.join(FRAME_DIR, f"frame-{_frame_digest(brand)}.jpg")
+    if os.path.exists(path):
+        _mark_used(path)
+        return path
+    os.makedirs(FRAME_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=FRAME_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            draw_frame(brand).save(f, format="JPEG", quality=85)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _prune(keep=path)
+    return path
+
+
+@lru_cache(maxsize=8)
+def _frame_digest(brand):
+    # Everything the drawing depends on, so a changed frame never reuses an old file
+    return hashlib.sha256(repr((FRAME_VERSION, brand, PAGE_MM, FRAME_DPI, ROSE, INK, PAPER, NAMES_Y, DATE_Y,
+                                sorted(FONTS.items()))).encode()).hexdigest()[:16]
+
+
+@lru_cache(maxsize=8)
+def _mark_used(path):
+    # Once per process, so _prune() in any process drops the frames nobody has used for longest
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def _prune(keep):
+    frames = []
+    for name in os.listdir(FRAME_DIR):
+        full = os.path.join(FRAME_DIR, name)
+        if not name.startswith("frame-") or full == keep:
+            continue
+        try:
+            frames.append((os.stat(full).st_mtime, full))
+        except FileNotFoundError:
+            continue
+    for _, full in sorted(frames, reverse=True)[MAX_FRAMES - 1:]:
+        try:
+            os.remove(full)
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache(maxsize=8)
+def _frame_strip(path, box):
+    """The part of the frame at ``path`` under ``box`` (mm), as a PIL image."""
+    with Image.open(path) as frame:
+        return frame.convert("RGB").crop(tuple(_px(mm) for mm in box))
+
+
+def _stamp(pdf, frame, box, text, style, sizes, fill):
+    """Put ``text`` centred in ``box`` (mm), drawn on a copy of the ``frame`` JPEG under it."""
+    strip = _frame_strip(frame, box)
+    measure = ImageDraw.Draw(strip)
+    # Sizes are in points; the frame is drawn at FRAME_DPI
+    largest, smallest = (round(pt * FRAME_DPI / 72) for pt in sizes)
+    size = largest
+    while size > smallest and measure.textlength(text, font=font(style, size)) > strip.width - _px(20):
+        size -= 4
+    face = font(style, size)
+    center = (strip.width / 2, strip.height / 2)
+    # Only the piece of the strip the text covers is copied, encoded and placed
+    left, top, right, bottom = measure.textbbox(center, text, font=face, anchor="mm")
+    left, top = max(0, int(left) - 2), max(0, int(top) - 2)
+    right, bottom = min(strip.width, int(right) + 3), min(strip.height, int(bottom) + 3)
+    if right <= left or bottom <= top:
+        return
+    piece = strip.crop((left, top, right, bottom))
+    ImageDraw.Draw(piece).text((center[0] - left, center[1] - top), text, font=face, fill=fill, anchor="mm")
+    fd, path = tempfile.mkstemp(suffix=".png")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            piece.save(f, format="PNG", compress_level=1)
+        mm = 25.4 / FRAME_DPI
+        pdf.image(path, x=box[0] + left * mm, y=box[1] + top * mm, w=piece.width * mm, h=piece.height * mm)
+    finally:
+        os.remove(path)
+
+
+def render_certificate(names, date=None, brand=BRAND):
+    """PDF bytes of a certificate for ``names``; ``date`` defaults to today."""
+    if not date:
+        date = Date.today().strftime("%B %d, %Y")
+    pdf = FPDF("L", "mm", "A4")
+    pdf.set_auto_page_break(False)
+    pdf.set_margins(0, 0)
+    pdf.add_page()
+    frame = frame_path(brand)
+    pdf.image(frame, x=0, y=0, w=PAGE_MM[0], h=PAGE_MM[1])
+    _stamp(pdf, frame, NAMES_BOX, printable(names), "serif-bold", NAMES_PT, ROSE)
+    _stamp(pdf, frame, DATE_BOX, printable(str(date)), "serif", (DATE_PT, DATE_PT), INK)
+    return _to_bytes(pdf.output(dest="S"))
+
+
+def read_couples(path):
+    """(names, date) rows of a CSV with ``names`` or ``partner1``/``partner2`` and an optional ``date``."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        if "names" not in fields and not {"partner1", "partner2"} <= set(fields):
+            raise ValueError(f"{path}: needs a 'names' column or 'partner1' and 'partner2' columns")
+        rows = []
+        for row in reader:
+            # Values past the header (a trailing comma) land under the None key and are ignored
+            if "names" in fields:
+                names = (row[fields["names"]] or "").strip()
+            else:
+                names = " & ".join(p for p in ((row[fields["partner1"]] or "").strip(),
+                                               (row[fields["partner2"]] or "").strip()) if p)
+            if names:
+                date = (row[fields["date"]] or "").strip() if "date" in fields else ""
+                rows.append((names, date or None))
+    return rows
+
+
+def certificate_filename(index, names):
+    return f"certificate-{index:04d}-{_UNSAFE.sub('-', names).strip('-').lower() or 'couple'}.pdf"
+
+
+def _render_row(row, date=None, brand=BRAND):
+    names, row_date = row
+    return render_certificate(names, row_date or date, brand)
+
+
+def bulk(rows, out_path, workers=None, date=None, brand=BRAND, chunksize=8):
+    """Render a certificate per (names, date) row in parallel; returns how many were written.
+
+    ``out_path`` ending in .zip gets one archive, anything else is a directory
+    of PDFs. Certificates are written in row order as they come back.
+    """
+    rows = list(rows)
+    render = partial(_render_row, date=date, brand=brand)
+    # Draw the frame before the workers start so they all find it on disk
+    frame_path(brand)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = zip(rows, executor.map(render, rows, chunksize=chunksize))
+        if out_path.lower().endswith(".zip"):
+            # The frame JPEG is already compressed
+            with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                for index, ((names, _), data) in enumerate(results, 1):
+                    archive.writestr(certificate_filename(index, names), data)
+        else:
+            os.makedirs(out_path, exist_ok=True)
+            for index, ((names, _), data) in enumerate(results, 1):
+                with open(os.path.join(out_path, certificate_filename(index, names)), "wb") as f:
+                    f.write(data)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Certificates of Love, one or a whole event's worth.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--names", help='one couple, e.g. "Asha & Ravi"')
+    source.add_argument("--csv", help="CSV of couples (names, or partner1 and partner2; optional date)")
+    parser.add_argument("-o", "--output", required=True, help="PDF for --names; .zip or directory for --csv")
+    parser.add_argument("--date", help="date printed on the certificates (default: today)")
+    parser.add_argument("--brand", default=BRAND)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.names:
+        with open(args.output, "wb") as f:
+            f.write(render_certificate(args.names, args.date, args.brand))
+        count = 1
+    else:
+        try:
+            rows = read_couples(args.csv)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 2
+        count = bulk(rows, args.output, args.workers, args.date, args.brand)
+    elapsed = time.perf_counter() - started
+    print(f"{count} certificate(s) in {elapsed:.2f}s "
+          f"({1000 * elapsed / max(count, 1):.1f} ms each) -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
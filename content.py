@@ -0,0 +1,77 @@
+# --- Static page content, loaded once per process ---
+# Tips, quotes and gift lists live in assets/catalog.json, and the page CSS in
+# assets/*.css, instead of being rebuilt as literals on every rerun. Each
+# stylesheet is minified once and published under static/css/ with a
+# content-hash name (served at app/static/css/, see static_assets.py), so a
+# rerun only sends a short <link> while the browser keeps the file cached.
+# The inline CSS goes out once per session, on its first run, so the page is
+# styled before the file is fetched (see emit_styles in app.py).
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from functools import lru_cache
+from string import Template
+
+from static_assets import STATIC_DIR
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+CATALOG_PATH = os.path.join(ASSETS_DIR, "catalog.json")
+CSS_DIR = os.path.join(STATIC_DIR, "css")
+CSS_URL = "app/static/css"
+
+_COMMENTS = re.compile(r"/\*.*?\*/", re.S)
+_SPACE = re.compile(r"\s+")
+_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+
+@lru_cache(maxsize=1)
+def catalog():
+    """Text catalogs by name; lists are returned as tuples so callers cannot mutate them."""
+    with open(CATALOG_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        "plan_ideas": tuple(data["plan_ideas"]),
+        "gift_ideas": tuple(data["gift_ideas"]),
+        "romantic_quotes": tuple((q["quote"], q["author"]) for q in data["romantic_quotes"]),
+        "pro_tips": tuple(data["pro_tips"]),
+        "age_gift_ideas": {group: tuple(ideas) for group, ideas in data["age_gift_ideas"].items()},
+    }
+
+
+def minify_css(css):
+    css = _COMMENTS.sub("", css)
+    css = _SPACE.sub(" ", css)
+    css = _PUNCT.sub(r"\1", css)
+    # Values keep their own spacing; only the space after "property:" goes
+    css = re.sub(r"([{;])([-\w]+): ", r"\1\2:", css)
+    return css.replace(";}", "}").strip()
+
+
+class Stylesheet:
+    def __init__(self, name, css):
+        self.name = name
+        self.css = css
+        self.digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:16]
+        self.filename = f"{name}-{self.digest}.css"
+        self.href = f"{CSS_URL}/{self.filename}"
+
+    def publish(self):
+        path = os.path.join(CSS_DIR, self.filename)
+        if not os.path.exists(path):
+            os.makedirs(CSS_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CSS_DIR, suffix=".part")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.css)
+            os.replace(tmp_path, path)
+        return self
+
+
+@lru_cache(maxsize=None)
+def stylesheet(name, **values):
+    """assets/<name>.css with ``$placeholders`` filled from ``values``, minified and published."""
+    with open(os.path.join(ASSETS_DIR, f"{name}.css"), encoding="utf-8") as f:
+        css = Template(f.read()).substitute(values)
+    return Stylesheet(name, minify_css(css)).publish()
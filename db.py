@@ -0,0 +1,121 @@
+# --- Shared SQLite data-access layer for LoveBook ---
+# One bounded pool of connections per process. app.py keeps a single pool in
+# st.cache_resource so every Streamlit session shares it; the webhook servers
+# can create their own with get_pool().
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from migrations import migrate
+
+DB_PATH = os.environ.get("LOVEBOOK_DB", "lovebook.db")
+POOL_SIZE = int(os.environ.get("LOVEBOOK_DB_POOL_SIZE", "8"))
+# How many compiled statements each connection keeps around for reuse
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA foreign_keys=ON",
+)
+
+def connect(path=DB_PATH):
+    """Open a connection with the LoveBook pragmas applied."""
+    conn = sqlite3.connect(
+        path,
+        timeout=5.0,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections.
+
+    Connections are opened lazily up to ``size``; callers block (up to
+    ``timeout`` seconds) when all of them are checked out. Pending schema
+    migrations run once when the pool is built, not on every checkout.
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=10.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        with self.connection() as conn:
+            migrate(conn)
+
+    def _acquire(self):
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return connect(self.path)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection free after {self.timeout}s") from None
+
+    def _release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; commits on success, rolls back on error."""
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def stats(self):
+        return {"size": self.size, "opened": self._opened, "idle": self._idle.qsize()}
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DB_PATH, size=POOL_SIZE):
+    """Process-wide pool for ``path`` (used outside Streamlit, e.g. webhooks)."""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path, size)
+        return pool
@@ -0,0 +1,128 @@
+# --- Draft persistence for the Create Memory Book tab ---
+# Answers typed into the question loop are tracked per question, coalesced in
+# memory and written in one batch by a background flusher. Drafts live in their
+# own tables so autosaving never touches users.story or users.usage_count.
+
+import threading
+import time
+from collections import OrderedDict
+
+from workers import PeriodicWorker
+
+FLUSH_INTERVAL = 3.0
+# Flush early once this many answers are waiting to be written
+MAX_PENDING = 200
+# Users whose last-seen answers are kept in memory (least recently active dropped first)
+MAX_SEEN_USERS = 1000
+
+
+class DraftStore:
+    def __init__(self, pool, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING, max_seen=MAX_SEEN_USERS):
+        self.pool = pool
+        self.max_pending = max_pending
+        self.max_seen = max_seen
+        self._lock = threading.Lock()
+        # user_id -> {question_key: answer} as last seen (persisted or pending)
+        self._seen = OrderedDict()
+        # user_id -> {question_key: answer} not yet written
+        self._dirty = {}
+        # user_id -> couple_names not yet written
+        self._dirty_names = {}
+        self._worker = PeriodicWorker(self.flush, flush_interval, name="draft-flusher").start()
+
+    def update(self, user_id, answers, couple_names):
+        """Record the current answers; only the ones that changed become dirty.
+
+        Returns the number of answers that changed.
+        """
+        changed = 0
+        with self._lock:
+            seen = self._seen_answers(user_id)
+            for key, answer in answers.items():
+                answer = (answer or "").strip()
+                if seen.get(key, "") != answer:
+                    seen[key] = answer
+                    self._dirty.setdefault(user_id, {})[key] = answer
+                    changed += 1
+            if changed or user_id in self._dirty:
+                self._dirty_names[user_id] = couple_names
+            pending = sum(len(d) for d in self._dirty.values())
+        if pending >= self.max_pending:
+            self._worker.wake()
+        return changed
+
+    def load(self, user_id):
+        """Return ``{question_key: answer}`` for the user's draft, including unflushed edits."""
+        with self._lock:
+            seen = self._seen_answers(user_id)
+            return {k: v for k, v in seen.items() if v}
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            names, self._dirty_names = self._dirty_names, {}
+        if not dirty and not names:
+            return 0
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (user_id, key, answer, now)
+            for user_id, answers in dirty.items()
+            for key, answer in answers.items()
+        ]
+        try:
+            with self.pool.connection() as conn:
+                conn.executemany(
+                    "INSERT INTO drafts (user_id, couple_names, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET couple_names=excluded.couple_names, "
+                    "updated_at=excluded.updated_at",
+                    [(user_id, couple_names, now) for user_id, couple_names in names.items()]
+                )
+                conn.executemany(
+                    "INSERT INTO draft_answers (user_id, question_key, answer, updated_at) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT(user_id, question_key) DO UPDATE SET "
+                    "answer=excluded.answer, updated_at=excluded.updated_at",
+                    rows
+                )
+        except Exception:
+            # Put the batch back (newer edits win) so the next flush retries it
+            with self._lock:
+                for user_id, answers in dirty.items():
+                    merged = dict(answers)
+                    merged.update(self._dirty.get(user_id, {}))
+                    self._dirty[user_id] = merged
+                for user_id, couple_names in names.items():
+                    self._dirty_names.setdefault(user_id, couple_names)
+            raise
+        return len(rows)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._seen.pop(user_id, None)
+            self._dirty.pop(user_id, None)
+            self._dirty_names.pop(user_id, None)
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM draft_answers WHERE user_id=?", (user_id,))
+            conn.execute("DELETE FROM drafts WHERE user_id=?", (user_id,))
+
+    def close(self):
+        self._worker.stop()
+
+    def _seen_answers(self, user_id):
+        # Caller holds the lock
+        seen = self._seen.get(user_id)
+        if seen is None:
+            seen = self._seen[user_id] = self._load_answers(user_id)
+        self._seen.move_to_end(user_id)
+        excess = len(self._seen) - self.max_seen
+        if excess > 0:
+            # Users with unwritten edits stay until they are flushed
+            for idle in [uid for uid in self._seen if uid not in self._dirty and uid != user_id][:excess]:
+                del self._seen[idle]
+        return seen
+
+    def _load_answers(self, user_id):
+        with self.pool.connection() as conn:
+            cur = conn.execute(
+                "SELECT question_key, answer FROM draft_answers WHERE user_id=?", (user_id,)
+            )
+            return dict(cur.fetchall())
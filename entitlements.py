@@ -0,0 +1,74 @@
+# --- Cached role checks ---
+# The session keeps the user row read at login, so a premium upgrade applied
+# by the payments service was invisible until the next login. Roles are now
+# read through EntitlementCache: an in-process TTL cache keyed by user id.
+# A background poller reads the one-row entitlement_version table, which a
+# trigger bumps whenever any writer changes users.role. When the counter moves,
+# the cache is dropped, so upgrades show up within a poll interval while role
+# checks stay dictionary lookups.
+
+import threading
+import time
+
+from workers import PeriodicWorker
+
+ROLE_TTL = 300.0
+POLL_INTERVAL = 2.0
+
+
+class EntitlementCache:
+    def __init__(self, pool, ttl=ROLE_TTL, poll_interval=POLL_INTERVAL):
+        self.pool = pool
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # user_id -> (role, expires_at)
+        self._roles = {}
+        # Bumped by every invalidate(); a role read from the database is only
+        # cached if no invalidation happened while it was being read
+        self._generation = 0
+        self._version = self._read_version()
+        self._worker = PeriodicWorker(self.poll, poll_interval, name="entitlements-poll").start()
+
+    def role(self, user_id, default=None):
+        """Current role of ``user_id`` (``default`` if the user does not exist)."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._roles.get(user_id)
+            generation = self._generation
+        if cached and cached[1] > now:
+            return cached[0]
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT role FROM users WHERE id=?", (user_id,)).fetchone()
+        role = row[0] if row else default
+        with self._lock:
+            if self._generation == generation:
+                self._roles[user_id] = (role, now + self.ttl)
+        return role
+
+    def is_premium(self, user_id):
+        return self.role(user_id) == "premium"
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._roles.clear()
+            else:
+                self._roles.pop(user_id, None)
+
+    def poll(self):
+        """Drop the cache if any role changed since the last poll; returns True if it did."""
+        version = self._read_version()
+        if version == self._version:
+            return False
+        self._version = version
+        self.invalidate()
+        return True
+
+    def close(self):
+        self._worker.stop()
+
+    def _read_version(self):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT version FROM entitlement_version WHERE id=1").fetchone()
+        return row[0] if row else 0
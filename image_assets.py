@@ -0,0 +1,128 @@
+# --- Preprocessed image renditions (PDF page, web background, thumbnail) ---
+# An image is decoded once per content hash; every rendition is resized and
+# encoded in that pass and the encoded bytes are kept in a size-bounded LRU.
+# Large JPEGs (12MP phone photos) are decoded with Image.draft, which lets
+# libjpeg scale down by 1/2, 1/4 or 1/8 while decoding.
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps, features
+
+# Page backgrounds go out as WebP when Pillow was built with it
+if features.check("webp"):
+    _WEB = ("WEBP", {"quality": 80, "method": 4}, "image/webp")
+else:
+    _WEB = ("JPEG", {"quality": 85, "optimize": True, "progressive": True}, "image/jpeg")
+
+# name -> (size, format, save options, mime)
+RENDITIONS = {
+    "pdf": ((595, 842), "JPEG", {"quality": 90}, "image/jpeg"),
+    "web": ((1920, 1080),) + _WEB,
+    "thumb": ((320, 180), "JPEG", {"quality": 80}, "image/jpeg"),
+}
+# Encoded renditions above this are re-encoded at lower quality
+MAX_RENDITION_BYTES = {"web": 400 * 1024}
+CACHE_MAX_BYTES = 96 * 1024 * 1024
+# Smallest decode size that still covers every rendition
+_DECODE_SIZE = (
+    max(size[0] for size, *_ in RENDITIONS.values()),
+    max(size[1] for size, *_ in RENDITIONS.values()),
+)
+# EXIF orientations that swap width and height
+_ROTATED = {5, 6, 7, 8}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _decode(data, max_size):
+    img = Image.open(io.BytesIO(data))
+    if img.format == "JPEG":
+        w, h = max_size
+        if img.getexif().get(0x0112) in _ROTATED:
+            w, h = h, w
+        img.draft("RGB", (w, h))
+    img = ImageOps.exif_transpose(img)
+    return img.convert("RGB")
+
+
+def _encode(img, name):
+    size, fmt, options, _ = RENDITIONS[name]
+    img = img.resize(size, Image.LANCZOS)
+    options = dict(options)
+    cap = MAX_RENDITION_BYTES.get(name)
+    while True:
+        buf = io.BytesIO()
+        img.save(buf, format=fmt, **options)
+        if cap is None or buf.tell() <= cap or options.get("quality", 0) <= 40:
+            return buf.getvalue()
+        options["quality"] -= 15
+
+
+def extension(name):
+    return {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}[RENDITIONS[name][1]]
+
+
+class AssetCache:
+    """LRU of encoded renditions keyed by (content hash, rendition name)."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, data, name, digest=None):
+        """Encoded bytes of rendition ``name`` for the image ``data``."""
+        digest = digest or content_hash(data)
+        cached = self._lookup(digest, name)
+        if cached is not None:
+            return cached
+        # Decode once at the largest rendition size and fill every rendition
+        img = _decode(data, _DECODE_SIZE)
+        encoded = {n: _encode(img, n) for n in RENDITIONS}
+        for n, blob in encoded.items():
+            self._store(digest, n, blob)
+        return encoded[name]
+
+    def mime(self, name):
+        return RENDITIONS[name][3]
+
+    def _lookup(self, digest, name):
+        with self._lock:
+            blob = self._items.get((digest, name))
+            if blob is not None:
+                self._items.move_to_end((digest, name))
+            return blob
+
+    def _store(self, digest, name, blob):
+        with self._lock:
+            old = self._items.pop((digest, name), None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[(digest, name)] = blob
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """Process-wide rendition cache (shared by the PDF export and page backgrounds)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache()
+        return _cache
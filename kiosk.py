@@ -0,0 +1,46 @@
+# --- Kiosk runtime profile (KIOSK_MODE=1) ---
+# Venue tablets run many short guest sessions at once, so in kiosk mode:
+#   * random tips and quotes are picked once per process instead of on every
+#     rerun, so each run emits the same markup;
+#   * heavy or rarely used sections (sidebar extras, feedback form, audio,
+#     share card) are replaced by a button until the guest asks for them;
+#   * audio requests are turned away while too many are already waiting.
+# PDFs go through the bounded render service (render_service.py) in every
+# mode, and the guest sees their place in line.
+# kiosk_bench.py simulates N tablets against the app.
+
+import os
+import random
+from functools import lru_cache
+
+import streamlit as st
+
+KIOSK_MODE = os.environ.get("KIOSK_MODE", "0") == "1"
+# Audio jobs allowed to wait in the TTS service before new requests are turned away
+KIOSK_MAX_TTS_QUEUED = int(os.environ.get("KIOSK_MAX_TTS_QUEUED", "8"))
+
+
+@lru_cache(maxsize=None)
+def _process_pick(name, items, k):
+    return tuple(random.sample(items, k))
+
+
+def pick(name, items, k):
+    """``k`` random items; fixed for the whole process in kiosk mode."""
+    if KIOSK_MODE:
+        return list(_process_pick(name, tuple(items), k))
+    return random.sample(items, k)
+
+
+def on_demand(key, label):
+    """True when a section should render; in kiosk mode only after its button was pressed."""
+    if not KIOSK_MODE:
+        return True
+    flag = f"kiosk_show_{key}"
+    if st.session_state.get(flag):
+        return True
+    if st.button(label, key=f"kiosk_open_{key}"):
+        st.session_state[flag] = True
+        return True
+    return False
+
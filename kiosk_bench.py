@@ -0,0 +1,161 @@
+# --- Load benchmark: N kiosk tablets against app.py ---
+# Each simulated tablet is a Streamlit AppTest session on its own thread that
+# walks the guest flow (open, type names and answers, view the book, prepare
+# the PDF) while the others do the same. Reports reruns per second, rerun
+# latency percentiles and how long tablets waited for their PDF.
+#
+#     python kiosk_bench.py --tablets 20
+#     python kiosk_bench.py --tablets 20 --compare   # kiosk profile vs normal guest mode
+#
+# Runs against a fresh scratch database. KIOSK_MODE is read at import,
+# so --compare runs each profile in its own subprocess.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+SAMPLE_ANSWERS = {
+    "first_meeting": "We met at a friend's birthday party and talked all night.",
+    "fav_memory": "Watching the sunrise on the beach in Goa.",
+    "bond": "Sunday pancakes and terrible puns.",
+}
+
+
+def tablet(index, kiosk, latencies, pdf_waits, errors, pdf_timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+
+    def rerun():
+        started = time.perf_counter()
+        at.run()
+        latencies.append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    try:
+        rerun()
+        if not kiosk:
+            at.radio(key="onboarding_auth_mode").set_value("Continue as Guest")
+            rerun()
+        at.text_input(key="p1").input(f"Guest {index}")
+        at.text_input(key="p2").input("Partner")
+        rerun()
+        for key, answer in SAMPLE_ANSWERS.items():
+            at.text_area(key=f"ans_{key}").input(f"{answer} (tablet {index})")
+            rerun()
+        # Open the book the way Generate does
+        at.session_state.story = at.session_state.draft_model.text
+        at.session_state.couple_names = f"Guest {index} & Partner"
+        at.session_state.story_generated = True
+        rerun()
+        started = time.perf_counter()
+        at.button(key="prepare_pdf").click()
+        rerun()
+        # Tablets poll until their PDF is ready; AppTest does not run the PDF
+        # panel's one-second fragment timer, so the wait stands in for it
+        while any(b.key == "prepare_pdf" for b in at.button) or any(
+            "in line" in i.value or "Preparing" in i.value for i in at.info
+        ):
+            if time.perf_counter() - started > pdf_timeout:
+                raise TimeoutError("PDF not ready")
+            time.sleep(1)
+            rerun()
+            if not kiosk:
+                break
+        pdf_waits.append(time.perf_counter() - started)
+    except Exception as e:
+        errors.append(f"tablet {index}: {e}")
+
+
+def share_runtime():
+    """Let AppTest sessions run side by side like sessions of one server.
+
+    AppTest installs a mock Runtime singleton for each run and clears it
+    afterwards, which breaks concurrent runs. Install one shared mock and point
+    AppTest at a subclass, so its per-run set/clear no longer touches the real
+    singleton. The script is also compiled once and shared, as the server does
+    (concurrent compiles of the same source are not safe on every Python).
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    # Keep the bare-mode and widget warnings out of the report
+    config.set_option("logger.level", "error")
+    set_log_level("error")
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    app_test.Runtime = type("BenchRuntime", (Runtime,), {})
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(APP_PATH)
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def run(tablets, pdf_timeout):
+    kiosk = os.environ.get("KIOSK_MODE", "0") == "1"
+    share_runtime()
+    latencies, pdf_waits, errors = [], [], []
+    threads = [
+        threading.Thread(target=tablet, args=(i, kiosk, latencies, pdf_waits, errors, pdf_timeout))
+        for i in range(tablets)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    print(f"profile: {'kiosk' if kiosk else 'normal guest'}, {tablets} tablets, {elapsed:.1f}s")
+    print(f"  reruns {len(latencies)} ({len(latencies) / elapsed:.1f}/s), "
+          f"latency p50 {1000 * percentile(latencies, 50):.0f} ms, "
+          f"p95 {1000 * percentile(latencies, 95):.0f} ms")
+    print(f"  PDFs {len(pdf_waits)}, wait p50 {percentile(pdf_waits, 50):.1f}s, "
+          f"max {max(pdf_waits, default=0):.1f}s")
+    for error in errors:
+        print(f"  error: {error}")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent kiosk tablets.")
+    parser.add_argument("--tablets", type=int, default=10)
+    parser.add_argument("--pdf-timeout", type=float, default=120.0)
+    parser.add_argument("--compare", action="store_true", help="also run the normal (non-kiosk) profile")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        status = 0
+        for mode in ("1", "0"):
+            env = dict(os.environ, KIOSK_MODE=mode)
+            cmd = [sys.executable, __file__, "--tablets", str(args.tablets), "--pdf-timeout", str(args.pdf_timeout)]
+            status |= subprocess.call(cmd, env=env)
+        return status
+
+    os.environ.setdefault("KIOSK_MODE", "1")
+    os.environ["LOVEBOOK_DB"] = os.path.join(tempfile.mkdtemp(prefix="lovebook-bench-"), "lovebook.db")
+    return run(args.tablets, args.pdf_timeout)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# --- Versioned schema migrations for lovebook.db ---
+# Each migration has a number and runs exactly once per database; the highest
+# applied number is kept in the schema_version table. A migration and its
+# schema_version row are committed in one transaction, so a crash never leaves
+# a version half applied. The app runs pending migrations once when its
+# connection pool is created (not per rerun), and they can be run offline:
+#
+#     python migrations.py                 # apply everything pending
+#     python migrations.py --status        # show applied / pending
+#     python migrations.py --db other.db --to 3
+
+import argparse
+import sys
+import time
+
+from story import UNIVERSAL_QUESTIONS, StoryModel
+
+# The pages backfill parses this many stories at a time, so a large books table is never all in memory
+BACKFILL_BATCH = 5000
+
+_QUESTION_KEYS = {question: key for question, _, key, _ in UNIVERSAL_QUESTIONS}
+
+
+def _add_users_name_column(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+    if "name" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN name TEXT")
+
+
+def _backfill_user_names(conn):
+    # Fallback name is the part of the email before '@' (or 'User' without an email)
+    conn.execute(
+        '''UPDATE users SET name = CASE
+                WHEN COALESCE(email, '') = '' THEN 'User'
+                WHEN instr(email, '@') > 0 THEN substr(email, 1, instr(email, '@') - 1)
+                ELSE email
+            END
+            WHERE name IS NULL OR trim(name) = ''
+        '''
+    )
+
+
+def _backfill_books(conn):
+    # Carry over the one story each user could keep on their users row; _backfill_pages fills in the rest
+    conn.execute(
+        '''INSERT INTO books (user_id, title, couple_names, story, created_at, updated_at)
+            SELECT id, COALESCE(NULLIF(couple_names, ''), 'Untitled Book'), couple_names, story,
+                   created_at, created_at
+            FROM users
+            WHERE story IS NOT NULL AND story != ''
+              AND NOT EXISTS (SELECT 1 FROM books WHERE books.user_id = users.id)'''
+    )
+
+
+def _backfill_pages(conn):
+    # Books carried over from users rows have their story text only; parse it for pages and word count
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            '''SELECT id, story FROM books
+                WHERE id > ? AND story IS NOT NULL AND story != ''
+                  AND NOT EXISTS (SELECT 1 FROM pages WHERE pages.book_id = books.id)
+                ORDER BY id LIMIT ?''',
+            (last_id, BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        for book_id, story in rows:
+            model = StoryModel.parse(story)
+            conn.execute("UPDATE books SET word_count=? WHERE id=?", (model.word_count, book_id))
+            conn.executemany(
+                "INSERT INTO pages (book_id, page_no, question_key, question, answer) VALUES (?, ?, ?, ?, ?)",
+                [(book_id, p.number, _QUESTION_KEYS.get(p.question), p.question, p.answer) for p in model.pages]
+            )
+        last_id = rows[-1][0]
+
+
+# (version, description, steps); a step is an SQL string or a callable(conn)
+MIGRATIONS = [
+    (1, "users and analytics tables", [
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE,
+            password_hash TEXT,
+            role TEXT DEFAULT 'free',
+            usage_count INTEGER DEFAULT 0,
+            story TEXT,
+            couple_names TEXT,
+            profile_photo TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        # Analytics table for app hits, signups, logins
+        '''CREATE TABLE IF NOT EXISTS analytics (
+            event TEXT PRIMARY KEY,
+            count INTEGER DEFAULT 0
+        )''',
+    ]),
+    (2, "users.name column", [_add_users_name_column]),
+    (3, "fill in missing user names", [_backfill_user_names]),
+    (4, "hourly analytics counters", [
+        '''CREATE TABLE IF NOT EXISTS analytics_hourly (
+            event TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (event, bucket)
+        )''',
+    ]),
+    (5, "autosaved drafts", [
+        '''CREATE TABLE IF NOT EXISTS drafts (
+            user_id INTEGER PRIMARY KEY,
+            couple_names TEXT,
+            updated_at TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS draft_answers (
+            user_id INTEGER NOT NULL,
+            question_key TEXT NOT NULL,
+            answer TEXT,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (user_id, question_key)
+        )''',
+    ]),
+    (6, "books and pages", [
+        '''CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            title TEXT,
+            couple_names TEXT,
+            story TEXT,
+            word_count INTEGER DEFAULT 0,
+            is_private INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_books_user_created ON books (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_books_user_title ON books (user_id, title COLLATE NOCASE)",
+        '''CREATE TABLE IF NOT EXISTS pages (
+            book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+            page_no INTEGER NOT NULL,
+            question_key TEXT,
+            question TEXT,
+            answer TEXT,
+            PRIMARY KEY (book_id, page_no)
+        )''',
+        _backfill_books,
+    ]),
+    (7, "payment webhook events", [
+        # Append-only; a redelivered event hits the primary key and is ignored
+        '''CREATE TABLE IF NOT EXISTS payment_events (
+            provider TEXT NOT NULL,
+            event_id TEXT NOT NULL,
+            event_type TEXT,
+            email TEXT,
+            payload TEXT,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP,
+            PRIMARY KEY (provider, event_id)
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_payment_events_pending ON payment_events (received_at) "
+        "WHERE processed_at IS NULL",
+    ]),
+    (8, "entitlement version counter", [
+        '''CREATE TABLE IF NOT EXISTS entitlement_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )''',
+        "INSERT OR IGNORE INTO entitlement_version (id, version) VALUES (1, 0)",
+        # Every writer of users.role (webhooks, replays, manual fixes) bumps the counter
+        '''CREATE TRIGGER IF NOT EXISTS users_role_version AFTER UPDATE OF role ON users
+            WHEN OLD.role IS NOT NEW.role
+            BEGIN
+                UPDATE entitlement_version SET version = version + 1 WHERE id = 1;
+            END''',
+    ]),
+    (9, "book share tokens", [
+        "ALTER TABLE books ADD COLUMN share_token TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_books_share_token ON books (share_token) WHERE share_token IS NOT NULL",
+    ]),
+    (10, "pages and word counts of carried-over books", [_backfill_pages]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )'''
+    )
+    conn.commit()
+
+
+def current_version(conn):
+    _ensure_version_table(conn)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn, target=None, log=None):
+    """Apply pending migrations up to ``target``; returns the versions applied."""
+    target = LATEST_VERSION if target is None else target
+    applied = []
+    _ensure_version_table(conn)
+    for version, description, steps in MIGRATIONS:
+        if version > target:
+            break
+        # Take the write lock first, then re-check, so concurrent starters apply each migration once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT 1 FROM schema_version WHERE version=?", (version,)
+            ).fetchone()
+            if done:
+                conn.rollback()
+                continue
+            started = time.perf_counter()
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(version)
+        if log:
+            log(f"Applied migration {version}: {description} ({time.perf_counter() - started:.2f}s)")
+    return applied
+
+
+def main(argv=None):
+    from db import DB_PATH, connect
+
+    parser = argparse.ArgumentParser(description="Run LoveBook database migrations.")
+    parser.add_argument("--db", default=DB_PATH, help=f"database file (default: {DB_PATH})")
+    parser.add_argument("--to", type=int, default=None, help="stop after this version")
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        if args.status:
+            version = current_version(conn)
+            for number, description, _ in MIGRATIONS:
+                state = "applied" if number <= version else "pending"
+                print(f"{number:>3}  {state:<8} {description}")
+            return 0
+        applied = migrate(conn, target=args.to, log=print)
+        if not applied:
+            print(f"Database is up to date (version {current_version(conn)}).")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
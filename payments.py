@@ -0,0 +1,177 @@
+# --- Payment webhook ingestion shared by the Stripe and Razorpay endpoints ---
+# A delivery is verified, written once to the append-only payment_events table
+# (keyed by provider + event id, so provider retries are no-ops) and acked
+# straight away. Premium upgrades are applied by a background worker that
+# drains pending events in batches with one UPDATE ... WHERE email IN (...).
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+from db import get_pool
+from workers import PeriodicWorker
+
+APPLY_INTERVAL = 1.0
+# Emails per UPDATE; stays well under SQLite's bound-parameter limit
+APPLY_BATCH = 500
+# Stripe rejects signatures older than this many seconds
+STRIPE_TOLERANCE = 300
+
+# Event types that upgrade the paying user to premium
+UPGRADE_EVENTS = {
+    "stripe": {"checkout.session.completed"},
+    "razorpay": {"payment.captured"},
+}
+
+
+class SignatureError(ValueError):
+    pass
+
+
+def verify_stripe(payload, sig_header, secret, tolerance=STRIPE_TOLERANCE, now=None):
+    """Check a ``Stripe-Signature`` header and return the decoded event."""
+    timestamp, signatures = None, []
+    for item in (sig_header or "").split(","):
+        key, _, value = item.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+    if not timestamp or not signatures:
+        raise SignatureError("Malformed Stripe-Signature header")
+    signed = timestamp.encode() + b"." + payload
+    expected = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, sig) for sig in signatures):
+        raise SignatureError("Stripe signature does not match")
+    if tolerance and abs((now or time.time()) - int(timestamp)) > tolerance:
+        raise SignatureError("Stripe signature timestamp outside tolerance")
+    return json.loads(payload)
+
+
+def verify_razorpay(payload, signature, secret):
+    """Check an ``X-Razorpay-Signature`` header and return the decoded payload."""
+    expected = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+    if not signature or not hmac.compare_digest(expected, signature):
+        raise SignatureError("Razorpay signature does not match")
+    return json.loads(payload)
+
+
+def stripe_event(event):
+    """``(event_id, event_type, email)`` for a Stripe event."""
+    email = None
+    if event.get("type") in UPGRADE_EVENTS["stripe"]:
+        email = (event.get("data") or {}).get("object", {}).get("customer_email")
+    return event["id"], event.get("type"), email
+
+
+def razorpay_event(payload, event_id=None):
+    """``(event_id, event_type, email)`` for a Razorpay webhook body.
+
+    Razorpay sends the delivery id in the ``X-Razorpay-Event-Id`` header; without
+    it the payment id and event name identify the delivery.
+    """
+    event_type = payload.get("event")
+    entity = (payload.get("payload") or {}).get("payment", {}).get("entity", {})
+    email = None
+    if event_type in UPGRADE_EVENTS["razorpay"]:
+        # The email is put in the order notes when the checkout is created
+        email = (entity.get("notes") or {}).get("email")
+    if not event_id:
+        event_id = f"{entity.get('id')}:{event_type}"
+    return event_id, event_type, email
+
+
+def insert_events(conn, events):
+    """Insert ``(provider, event_id, event_type, email, payload)`` rows, skipping known ids.
+
+    Events without an upgrade email are stored already processed. Returns the
+    number of new rows.
+    """
+    before = conn.total_changes
+    conn.executemany(
+        "INSERT OR IGNORE INTO payment_events "
+        "(provider, event_id, event_type, email, payload, processed_at) "
+        "VALUES (?, ?, ?, ?, ?, CASE WHEN ? IS NULL THEN CURRENT_TIMESTAMP END)",
+        [
+            (provider, event_id, event_type, email or None,
+             payload.decode("utf-8", "replace") if isinstance(payload, bytes) else payload,
+             email or None)
+            for provider, event_id, event_type, email, payload in events
+        ]
+    )
+    return conn.total_changes - before
+
+
+def apply_upgrades(conn, limit=APPLY_BATCH):
+    """Upgrade the users of up to ``limit`` pending events; returns how many were applied."""
+    rows = conn.execute(
+        "SELECT rowid, email FROM payment_events WHERE processed_at IS NULL "
+        "ORDER BY received_at LIMIT ?",
+        (limit,)
+    ).fetchall()
+    if not rows:
+        return 0
+    emails = sorted({email for _, email in rows})
+    conn.execute(
+        f"UPDATE users SET role='premium' WHERE email IN ({','.join('?' * len(emails))})",
+        emails
+    )
+    conn.executemany(
+        "UPDATE payment_events SET processed_at=CURRENT_TIMESTAMP WHERE rowid=?",
+        [(rowid,) for rowid, _ in rows]
+    )
+    return len(rows)
+
+
+class PaymentEvents:
+    """Records webhook events and applies premium upgrades in the background."""
+
+    def __init__(self, pool, apply_interval=APPLY_INTERVAL, batch_size=APPLY_BATCH):
+        self.pool = pool
+        self.batch_size = batch_size
+        self._apply_lock = threading.Lock()
+        self._worker = PeriodicWorker(self.apply_pending, apply_interval, name="payments-apply").start()
+
+    def record(self, provider, event_id, event_type, email, payload):
+        """Store an event; returns False if it was already recorded (a retry)."""
+        with self.pool.connection() as conn:
+            new = insert_events(conn, [(provider, event_id, event_type, email, payload)]) == 1
+        if new and email:
+            self._worker.wake()
+        return new
+
+    def apply_pending(self):
+        """Upgrade the users of pending events; returns the number of events applied."""
+        applied = 0
+        with self._apply_lock:
+            while True:
+                with self.pool.connection() as conn:
+                    batch = apply_upgrades(conn, self.batch_size)
+                applied += batch
+                if batch < self.batch_size:
+                    break
+        return applied
+
+    def pending(self):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM payment_events WHERE processed_at IS NULL"
+            ).fetchone()[0]
+
+    def close(self):
+        self._worker.stop()
+
+
+_events = None
+_events_lock = threading.Lock()
+
+
+def get_payment_events():
+    """Process-wide PaymentEvents on the shared lovebook.db pool."""
+    global _events
+    with _events_lock:
+        if _events is None:
+            _events = PaymentEvents(get_pool())
+        return _events
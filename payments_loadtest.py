@@ -0,0 +1,197 @@
+# --- Load test for payments_service.py ---
+# Sends locally signed Stripe and Razorpay deliveries (with a share of
+# duplicate redeliveries) from many threads and reports throughput, latency
+# percentiles and how long the background upgrades take to drain.
+#
+#     python payments_loadtest.py                        # in-process server on a scratch db
+#     python payments_loadtest.py --url http://host:4242 # a running service
+#
+# Against a running service, sign with the same STRIPE_WEBHOOK_SECRET and
+# RAZORPAY_WEBHOOK_SECRET the service uses.
+
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+DEFAULT_SECRETS = {"stripe": "whsec_loadtest", "razorpay": "rzp_loadtest"}
+
+
+def stripe_delivery(n, email, secret):
+    body = json.dumps({
+        "id": f"evt_load_{n}",
+        "type": "checkout.session.completed",
+        "data": {"object": {"customer_email": email}},
+    }).encode()
+    timestamp = str(int(time.time()))
+    sig = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return "/webhook/stripe", body, {"Stripe-Signature": f"t={timestamp},v1={sig}"}
+
+
+def razorpay_delivery(n, email, secret):
+    body = json.dumps({
+        "event": "payment.captured",
+        "payload": {"payment": {"entity": {"id": f"pay_load_{n}", "notes": {"email": email}}}},
+    }).encode()
+    sig = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return "/webhook/razorpay", body, {"X-Razorpay-Signature": sig, "X-Razorpay-Event-Id": f"evt_rzp_{n}"}
+
+
+def build_deliveries(count, users, duplicates, secrets, seed=0):
+    rng = random.Random(seed)
+    deliveries = []
+    for n in range(count):
+        if deliveries and rng.random() < duplicates:
+            # Providers redeliver the exact same body and signature
+            deliveries.append(rng.choice(deliveries))
+            continue
+        email = f"load{rng.randrange(users)}@example.com"
+        if rng.random() < 0.5:
+            deliveries.append(stripe_delivery(n, email, secrets["stripe"]))
+        else:
+            deliveries.append(razorpay_delivery(n, email, secrets["razorpay"]))
+    return deliveries
+
+
+class Client(threading.local):
+    """One keep-alive HTTP connection per load-test thread."""
+
+    def __init__(self, netloc):
+        self.netloc = netloc
+        self.conn = None
+
+    def post(self, path, body, headers):
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.netloc, timeout=30)
+            try:
+                self.conn.request("POST", path, body, dict(headers, **{"Content-Type": "application/json"}))
+                response = self.conn.getresponse()
+                response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    self.conn.close()
+                    self.conn = None
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+
+def get_json(netloc, path):
+    conn = http.client.HTTPConnection(netloc, timeout=10)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def start_local_server(users):
+    """Run the service in this process on a scratch database; returns (netloc, secrets, cleanup)."""
+    from werkzeug.serving import make_server
+
+    from db import ConnectionPool
+    from payments import PaymentEvents
+    from payments_service import create_app, load_adapters
+
+    workdir = tempfile.mkdtemp(prefix="lovebook-loadtest-")
+    pool = ConnectionPool(os.path.join(workdir, "lovebook.db"))
+    with pool.connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (email, role) VALUES (?, 'free')",
+            [(f"load{i}@example.com",) for i in range(users)]
+        )
+    events = PaymentEvents(pool)
+    secrets = {name: os.environ.get(f"{name.upper()}_WEBHOOK_SECRET", secret)
+               for name, secret in DEFAULT_SECRETS.items()}
+    environ = {"STRIPE_WEBHOOK_SECRET": secrets["stripe"], "RAZORPAY_WEBHOOK_SECRET": secrets["razorpay"]}
+    # Per-request access logging would dominate the timings
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, create_app(load_adapters(environ=environ), events), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def cleanup():
+        server.shutdown()
+        events.close()
+        pool.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return f"127.0.0.1:{server.server_port}", secrets, cleanup
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the LoveBook payments webhook service.")
+    parser.add_argument("--url", help="running service to target (default: start one in-process)")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of redelivered events")
+    args = parser.parse_args(argv)
+
+    cleanup = None
+    if args.url:
+        netloc = urlsplit(args.url).netloc
+        secrets = {name: os.environ.get(f"{name.upper()}_WEBHOOK_SECRET", secret)
+                   for name, secret in DEFAULT_SECRETS.items()}
+    else:
+        netloc, secrets, cleanup = start_local_server(args.users)
+
+    try:
+        deliveries = build_deliveries(args.requests, args.users, args.duplicates, secrets)
+        client = Client(netloc)
+        latencies, statuses = [], Counter()
+        lock = threading.Lock()
+
+        def send(delivery):
+            started = time.perf_counter()
+            try:
+                status = client.post(*delivery)
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(send, deliveries))
+        elapsed = time.perf_counter() - started
+
+        drain_started = time.perf_counter()
+        while get_json(netloc, "/healthz").get("pending_upgrades"):
+            time.sleep(0.05)
+        drained = time.perf_counter() - drain_started
+
+        latencies.sort()
+        print(f"{len(deliveries)} deliveries in {elapsed:.2f}s: {len(deliveries) / elapsed:.0f} req/s "
+              f"with {args.concurrency} threads")
+        print(f"latency p50 {1000 * percentile(latencies, 50):.1f} ms, "
+              f"p95 {1000 * percentile(latencies, 95):.1f} ms, "
+              f"p99 {1000 * percentile(latencies, 99):.1f} ms")
+        print(f"statuses {dict(statuses)}; upgrades drained {drained:.2f}s after the last ack")
+        print(json.dumps(get_json(netloc, "/metrics")["providers"], indent=2))
+    finally:
+        if cleanup:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
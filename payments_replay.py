@@ -0,0 +1,138 @@
+# --- Replay exported payment events into lovebook.db ---
+# Catches premium entitlements up after webhook downtime. Reads Stripe and/or
+# Razorpay event exports as JSONL (one event per line, optionally .gz) as a
+# stream, records them in payment_events (events already there are skipped)
+# and applies the upgrades, one transaction per batch. Memory use depends on
+# the batch size, not the file size.
+#
+#     python payments_replay.py stripe-events.jsonl.gz razorpay-events.jsonl
+#     python payments_replay.py --provider razorpay --batch 10000 export.jsonl
+
+import argparse
+import gzip
+import io
+import json
+import sys
+import time
+
+from payments import apply_upgrades, insert_events, razorpay_event, stripe_event
+
+BATCH_SIZE = 5000
+REPORT_EVERY = 5.0
+
+
+def open_events(path):
+    """Text stream for ``path``; ``-`` is stdin and ``.gz`` files are decompressed."""
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def detect_provider(event):
+    if "event" in event and "payload" in event:
+        return "razorpay"
+    if "id" in event and "type" in event:
+        return "stripe"
+    return None
+
+
+def parse_line(line, provider="auto"):
+    """``(provider, event_id, event_type, email, payload)`` for one exported event, or None."""
+    event = json.loads(line)
+    if provider == "auto":
+        provider = detect_provider(event)
+    if provider == "stripe":
+        return ("stripe",) + stripe_event(event) + (line,)
+    if provider == "razorpay":
+        # Exports may keep the delivery id next to the body
+        return ("razorpay",) + razorpay_event(event, event.get("event_id") or event.get("id")) + (line,)
+    return None
+
+
+class ReplayStats:
+    def __init__(self):
+        self.lines = self.new = self.skipped = self.upgraded = 0
+        self.started = time.perf_counter()
+
+    @property
+    def duplicates(self):
+        return self.lines - self.skipped - self.new
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        rate = self.lines / elapsed if elapsed else 0.0
+        print(
+            f"{'done' if final else 'progress'}: {self.lines} events in {elapsed:.1f}s ({rate:.0f}/s), "
+            f"{self.new} new, {self.duplicates} duplicates, {self.skipped} skipped, "
+            f"{self.upgraded} upgrades applied",
+            flush=True
+        )
+
+
+def replay(conn, lines, provider="auto", batch_size=BATCH_SIZE, stats=None, report_every=REPORT_EVERY):
+    """Record and apply the events in ``lines``; one transaction per batch."""
+    stats = stats or ReplayStats()
+    last_report = time.perf_counter()
+    batch = []
+
+    def commit_batch():
+        stats.new += insert_events(conn, batch)
+        # Drain everything pending, including events left by a crashed webhook worker
+        while True:
+            applied = apply_upgrades(conn, batch_size)
+            stats.upgraded += applied
+            if applied < batch_size:
+                break
+        conn.commit()
+        batch.clear()
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        stats.lines += 1
+        try:
+            event = parse_line(line, provider)
+        except (ValueError, KeyError, AttributeError):
+            event = None
+        if event is None:
+            stats.skipped += 1
+            continue
+        batch.append(event)
+        if len(batch) >= batch_size:
+            commit_batch()
+            if report_every and time.perf_counter() - last_report >= report_every:
+                stats.report()
+                last_report = time.perf_counter()
+    commit_batch()
+    return stats
+
+
+def main(argv=None):
+    from db import DB_PATH, connect
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Replay exported payment events into lovebook.db.")
+    parser.add_argument("files", nargs="+", help="JSONL event exports (.gz allowed, - for stdin)")
+    parser.add_argument("--db", default=DB_PATH, help=f"database file (default: {DB_PATH})")
+    parser.add_argument("--provider", choices=("auto", "stripe", "razorpay"), default="auto")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="events per transaction")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        migrate(conn)
+        stats = ReplayStats()
+        for path in args.files:
+            with open_events(path) as lines:
+                replay(conn, lines, args.provider, args.batch, stats)
+        stats.report(final=True)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# --- One webhook service for every payment provider ---
+# Replaces running stripe_webhook.py and razorpay_webhook.py as two
+# single-threaded Flask dev servers. Each provider is an adapter that verifies
+# a delivery and extracts (event_id, event_type, email); recording and the
+# premium upgrades go through payments.PaymentEvents on the shared db pool.
+#
+#     python payments_service.py --port 4242
+#
+# Serves POST /webhook/<provider> plus the old /webhook (Stripe) and
+# /razorpay-webhook (Razorpay) paths, GET /healthz and GET /metrics. Uses
+# waitress when it is installed, otherwise werkzeug's threaded server.
+
+import argparse
+import os
+import threading
+import time
+from functools import partial
+
+from flask import Flask, jsonify, request
+
+from payments import (
+    SignatureError,
+    get_payment_events,
+    razorpay_event,
+    stripe_event,
+    verify_razorpay,
+    verify_stripe,
+)
+
+SERVER_THREADS = int(os.environ.get("LOVEBOOK_PAYMENTS_THREADS", "16"))
+
+
+class StripeAdapter:
+    name = "stripe"
+    secret_env = "STRIPE_WEBHOOK_SECRET"
+
+    def __init__(self, secret):
+        self.secret = secret
+
+    def parse(self, body, headers):
+        event = verify_stripe(body, headers.get("Stripe-Signature"), self.secret)
+        return stripe_event(event)
+
+
+class RazorpayAdapter:
+    name = "razorpay"
+    secret_env = "RAZORPAY_WEBHOOK_SECRET"
+
+    def __init__(self, secret):
+        self.secret = secret
+
+    def parse(self, body, headers):
+        payload = verify_razorpay(body, headers.get("X-Razorpay-Signature"), self.secret)
+        return razorpay_event(payload, headers.get("X-Razorpay-Event-Id"))
+
+
+ADAPTERS = {adapter.name: adapter for adapter in (StripeAdapter, RazorpayAdapter)}
+# Paths the two old servers listened on
+LEGACY_ROUTES = {"/webhook": "stripe", "/razorpay-webhook": "razorpay"}
+
+
+def load_adapters(names=None, environ=os.environ):
+    """Adapters for ``names`` (default: every provider whose secret is set)."""
+    adapters = {}
+    for name, cls in ADAPTERS.items():
+        if names is not None and name not in names:
+            continue
+        secret = environ.get(cls.secret_env)
+        if secret:
+            adapters[name] = cls(secret)
+        elif names is not None:
+            raise KeyError(f"{cls.secret_env} must be set to serve {name} webhooks")
+    return adapters
+
+
+class Metrics:
+    """Per-provider delivery counters, exposed on /metrics."""
+
+    FIELDS = ("received", "recorded", "duplicates", "rejected", "errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._latency = {}
+        self.started = time.time()
+
+    def observe(self, provider, outcome, seconds):
+        with self._lock:
+            counts = self._counts.setdefault(provider, dict.fromkeys(self.FIELDS, 0))
+            counts["received"] += 1
+            counts[outcome] += 1
+            total, worst = self._latency.get(provider, (0.0, 0.0))
+            self._latency[provider] = (total + seconds, max(worst, seconds))
+
+    def snapshot(self):
+        with self._lock:
+            providers = {}
+            for provider, counts in self._counts.items():
+                total, worst = self._latency[provider]
+                providers[provider] = dict(
+                    counts,
+                    avg_ms=round(1000 * total / counts["received"], 3),
+                    max_ms=round(1000 * worst, 3),
+                )
+        return {"uptime_s": round(time.time() - self.started, 1), "providers": providers}
+
+
+def create_app(adapters=None, events=None):
+    """Flask app serving webhooks for ``adapters`` (default: from the environment)."""
+    adapters = load_adapters() if adapters is None else adapters
+    app = Flask(__name__)
+    metrics = Metrics()
+    app.config["METRICS"] = metrics
+
+    def payment_events():
+        return events if events is not None else get_payment_events()
+
+    def handle(provider):
+        adapter = adapters.get(provider)
+        if adapter is None:
+            return jsonify({"error": f"Unknown provider {provider}"}), 404
+        started = time.perf_counter()
+        body = request.get_data()
+        try:
+            event_id, event_type, email = adapter.parse(body, request.headers)
+        except (SignatureError, ValueError, KeyError, AttributeError) as e:
+            metrics.observe(provider, "rejected", time.perf_counter() - started)
+            return jsonify({"error": str(e)}), 400
+        try:
+            new = payment_events().record(provider, event_id, event_type, email, body)
+        except Exception as e:
+            # 5xx makes the provider redeliver later
+            metrics.observe(provider, "errors", time.perf_counter() - started)
+            return jsonify({"error": str(e)}), 503
+        metrics.observe(provider, "recorded" if new else "duplicates", time.perf_counter() - started)
+        return "", 200
+
+    app.add_url_rule("/webhook/<provider>", "webhook", handle, methods=["POST"])
+    for path, provider in LEGACY_ROUTES.items():
+        app.add_url_rule(path, f"legacy_{provider}", partial(handle, provider), methods=["POST"])
+
+    @app.route("/healthz")
+    def healthz():
+        try:
+            pending = payment_events().pending()
+        except Exception as e:
+            return jsonify({"status": "error", "error": str(e)}), 503
+        return jsonify({"status": "ok", "providers": sorted(adapters), "pending_upgrades": pending})
+
+    @app.route("/metrics")
+    def metrics_view():
+        snapshot = metrics.snapshot()
+        snapshot["pool"] = payment_events().pool.stats()
+        return jsonify(snapshot)
+
+    return app
+
+
+def serve(app, host="0.0.0.0", port=4242, threads=SERVER_THREADS):
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        from werkzeug.serving import make_server
+        print(f"waitress not installed; serving on werkzeug's threaded server at {host}:{port}")
+        make_server(host, port, app, threaded=True).serve_forever()
+    else:
+        waitress_serve(app, host=host, port=port, threads=threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve LoveBook payment webhooks.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=4242)
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS)
+    parser.add_argument("--provider", action="append", choices=sorted(ADAPTERS),
+                        help="only serve these providers (default: all with a secret set)")
+    args = parser.parse_args(argv)
+    serve(create_app(load_adapters(args.provider)), args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
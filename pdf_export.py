@@ -0,0 +1,131 @@
+# --- PDF export for memory books ---
+# PDFs are rendered on demand and memoized by a content hash of
+# (title, story, background image bytes) in a size-bounded LRU cache.
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from fpdf import FPDF
+
+from image_assets import get_asset_cache
+
+DEFAULT_BG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "default-love_bg.jpg")
+CACHE_MAX_ENTRIES = 32
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _to_bytes(out):
+    # pyfpdf returns a latin-1 str, fpdf2 a bytearray
+    if isinstance(out, str):
+        return out.encode("latin-1")
+    return bytes(out)
+
+
+# pyfpdf's core fonts are latin-1 only
+_TYPOGRAPHY = str.maketrans({"—": "-", "–": "-", "‘": "'", "’": "'", "“": '"', "”": '"', "…": "...", "♥": ""})
+
+
+def latin1(text):
+    """``text`` with typographic characters simplified and anything else outside latin-1 as '?'."""
+    return text.translate(_TYPOGRAPHY).encode("latin-1", "replace").decode("latin-1")
+
+
+_default_bg = None
+
+
+def _default_background():
+    global _default_bg
+    if _default_bg is None:
+        with open(DEFAULT_BG_PATH, 'rb') as f:
+            _default_bg = f.read()
+    return _default_bg
+
+
+def _page_background(bg_bytes=None):
+    # Use the uploaded image or the default love theme (hearts and roses)
+    return get_asset_cache().get(bg_bytes or _default_background(), "pdf")
+
+
+def render_pdf(title, story, bg_bytes=None):
+    """Lay out a memory book PDF and return its bytes."""
+    pdf = FPDF()
+    pdf.add_page()
+    fd, bg_path = tempfile.mkstemp(suffix='.jpg')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_page_background(bg_bytes))
+        pdf.image(bg_path, x=0, y=0, w=210, h=297)
+        pdf.set_font("Arial", 'B', 18)
+        pdf.set_text_color(185, 19, 114)
+        pdf.cell(0, 10, latin1(title), ln=True, align='C')
+        pdf.ln(10)
+        pdf.set_font("Arial", '', 12)
+        pdf.set_text_color(0, 0, 0)
+        for line in story.split('\n'):
+            line = line.strip()
+            if line:
+                pdf.multi_cell(0, 8, latin1(line))
+            else:
+                pdf.ln(4)
+        # Add signature at the end
+        pdf.ln(8)
+        pdf.set_font("Arial", 'I', 12)
+        pdf.set_text_color(185, 19, 114)
+        pdf.cell(0, 10, "- Made with SoulVest Memory Book (Love)", ln=True, align='R')
+        return _to_bytes(pdf.output(dest='S'))
+    finally:
+        os.remove(bg_path)
+
+
+def pdf_cache_key(title, story, bg_bytes=None):
+    h = hashlib.sha256()
+    for part in (title.encode(), story.encode(), bg_bytes or b""):
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class PdfCache:
+    """LRU of rendered PDFs bounded by entry count and total size."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = data
+            self._bytes += len(data)
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get_or_render(self, title, story, bg_bytes=None):
+        key = pdf_cache_key(title, story, bg_bytes)
+        data = self.get(key)
+        if data is None:
+            data = render_pdf(title, story, bg_bytes)
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes}
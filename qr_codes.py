@@ -0,0 +1,42 @@
+# --- QR code rendering with memoization ---
+# QR images are pure functions of (url, colors, size), so each one is rendered
+# once per process and handed out as pre-encoded PNG bytes.
+
+import io
+from functools import lru_cache
+from urllib.parse import urlencode
+
+import qrcode
+
+HOMEPAGE_URL = "https://soulvest-lovebook.streamlit.app/"
+QR_FILL = "#b91372"
+QR_BACK = "white"
+
+
+@lru_cache(maxsize=512)
+def qr_png(url, fill_color=QR_FILL, back_color=QR_BACK, box_size=8, border=2):
+    """PNG bytes of a QR code for ``url``."""
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=border)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color=fill_color, back_color=back_color).convert('RGB')
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def book_share_url(token, base_url=HOMEPAGE_URL):
+    """Link that opens a public book; ``token`` is its share token (books.share_token)."""
+    return f"{base_url}?{urlencode({'book': token})}"
+
+
+def bulk_qr_png(urls, executor=None, **style):
+    """``{url: png bytes}`` for many URLs; duplicates are rendered once.
+
+    Pass a ``concurrent.futures`` executor to spread cache misses over it.
+    """
+    urls = list(dict.fromkeys(urls))
+    if executor is None:
+        return {url: qr_png(url, **style) for url in urls}
+    futures = {url: executor.submit(qr_png, url, **style) for url in urls}
+    return {url: future.result() for url, future in futures.items()}
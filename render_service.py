@@ -0,0 +1,315 @@
+# --- Render farm for PDFs, share cards and certificates ---
+# Rendering is CPU-bound Python (FPDF layout, PIL drawing), so running it on
+# the Streamlit script thread stalls every other session through the GIL.
+# RenderService runs renders in a pool of worker processes instead:
+#   * at most ``workers`` renders run at once and up to ``max_queued`` wait;
+#     beyond that submit() raises QueueFull;
+#   * a job running longer than ``timeout`` fails, and its worker process is
+#     killed and replaced (other running jobs are put back in line);
+#   * if a worker process dies the pool is restarted and the running jobs
+#     retried one at a time, failing the job that crashes it again;
+#   * results are kept in a size-bounded LRU keyed by a hash of the inputs,
+#     and submitting the same inputs again reuses the queued, running or
+#     finished job;
+#   * the UI polls get()/position() and reads the bytes with result().
+# Renderers are looked up by name inside the worker, so their modules must not
+# import Streamlit.
+
+import hashlib
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from importlib import import_module
+
+from pdf_export import PdfCache
+from workers import PeriodicWorker
+
+RENDER_WORKERS = int(os.environ.get("LOVEBOOK_RENDER_WORKERS", str(os.cpu_count() or 2)))
+RENDER_MAX_QUEUED = int(os.environ.get("LOVEBOOK_RENDER_MAX_QUEUED", "64"))
+RENDER_TIMEOUT = float(os.environ.get("LOVEBOOK_RENDER_TIMEOUT", "60"))
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 128 * 1024 * 1024
+# A job running when a worker process dies twice is failed rather than retried
+MAX_CRASHES = 2
+
+# kind -> "module:function"
+RENDERERS = {
+    "pdf": "pdf_export:render_pdf",
+    "certificate": "certificates:render_certificate",
+    "card": "cards:render_card",
+}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+def render_key(kind, *args):
+    h = hashlib.sha256(kind.encode())
+    for arg in args:
+        if arg is None:
+            part = b"\0none"
+        elif isinstance(arg, (bytes, bytearray)):
+            part = bytes(arg)
+        else:
+            part = str(arg).encode()
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def _render(spec, args):
+    # Runs in a worker process; ``spec`` is a RENDERERS value
+    module, name = spec.split(":")
+    return bytes(getattr(import_module(module), name)(*args))
+
+
+class RenderJob:
+    def __init__(self, job_id, key, kind, args):
+        self.id = job_id
+        self.key = key
+        self.kind = kind
+        self.args = args
+        self.status = QUEUED
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.crashes = 0
+        self._done = threading.Event()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class RenderService:
+    def __init__(self, workers=RENDER_WORKERS, max_queued=RENDER_MAX_QUEUED, timeout=RENDER_TIMEOUT,
+                 cache=None, keep_finished=256):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.keep_finished = keep_finished
+        # PdfCache is a plain LRU of bytes, used here for every kind of render
+        self.cache = cache or PdfCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES)
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._running = set()
+        self._jobs = {}
+        self._by_key = OrderedDict()
+        self._ids = itertools.count(1)
+        self._executor = None
+        self._watchdog = PeriodicWorker(self.check_timeouts, 1.0, name="render-watchdog").start()
+
+    def submit(self, kind, *args):
+        """Queue a ``kind`` render of ``args``; returns a job (possibly an existing one)."""
+        if kind not in RENDERERS:
+            raise ValueError(f"unknown render kind {kind!r}")
+        key = render_key(kind, *args)
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and (job.status in (QUEUED, RUNNING) or
+                                    (job.status == DONE and self.cache.get(key) is not None)):
+                return job
+            if job is not None:
+                del self._jobs[job.id]
+            job = RenderJob(next(self._ids), key, kind, args)
+            if self.cache.get(key) is not None:
+                job.status = DONE
+                job._done.set()
+            elif len(self._pending) >= self.max_queued:
+                raise QueueFull(f"{len(self._pending)} renders are already waiting")
+            else:
+                self._pending.append(job)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            self._by_key.move_to_end(key)
+            self._forget_old()
+            self._dispatch()
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """1-based place in line for a waiting job, 0 once it has started."""
+        with self._lock:
+            try:
+                return self._pending.index(job) + 1
+            except ValueError:
+                return 0
+
+    def result(self, job):
+        """Rendered bytes of a finished job (None if not done or since evicted)."""
+        return self.cache.get(job.key) if job.status == DONE else None
+
+    def wait(self, job, timeout=None):
+        """Block until ``job`` finishes; returns its bytes, or None if it failed or is still running."""
+        job._done.wait(timeout)
+        return self.result(job)
+
+    def get_or_render(self, kind, *args):
+        """Cached bytes for these inputs, rendering them through the pool if needed."""
+        data = self.cache.get(render_key(kind, *args))
+        if data is None:
+            job = self.submit(kind, *args)
+            data = self.wait(job, self.timeout + 5)
+            if data is None:
+                raise RuntimeError(job.error or f"{kind} render did not finish")
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": len(self._pending),
+                "running": len(self._running),
+                "workers": self.workers,
+                "cache": self.cache.stats(),
+            }
+
+    def check_timeouts(self):
+        """Fail jobs running longer than ``timeout`` and replace the worker processes."""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._running if now - job.started_at > self.timeout]
+            if not expired:
+                return 0
+            for job in expired:
+                self._finish(job, FAILED, f"timed out after {self.timeout:.0f}s")
+            # A stuck worker cannot be interrupted, only killed; the other
+            # running jobs go back to the front of the line
+            for job in sorted(self._running, key=lambda j: j.id, reverse=True):
+                job.status, job.started_at, job.future = QUEUED, None, None
+                self._pending.appendleft(job)
+            self._running.clear()
+            old, self._executor = self._executor, None
+            self._dispatch()
+        self._kill(old)
+        return len(expired)
+
+    def close(self):
+        self._watchdog.stop()
+        with self._lock:
+            old, self._executor = self._executor, None
+            for job in list(self._pending) + list(self._running):
+                self._finish(job, FAILED, "render service stopped")
+            self._pending.clear()
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self):
+        # Caller holds the lock; start waiting jobs while workers are free
+        while self._pending and len(self._running) < self.workers:
+            fresh = self._executor is None
+            if fresh:
+                self._executor = self._start_executor()
+            job = self._pending[0]
+            # Jobs caught in a crash run alone, so a second crash is pinned on the right one
+            if self._running and (job.crashes or any(j.crashes for j in self._running)):
+                break
+            try:
+                future = self._executor.submit(_render, RENDERERS[job.kind], job.args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                if fresh:
+                    # Even a new pool cannot take work; fail rather than spin
+                    self._pending.popleft()
+                    self._finish(job, FAILED, str(e) or type(e).__name__)
+                else:
+                    self._restart_pool()
+                continue
+            self._pending.popleft()
+            job.status, job.started_at, job.future = RUNNING, time.time(), future
+            self._running.add(job)
+            future.add_done_callback(partial(self._completed, job))
+
+    def _start_executor(self):
+        # Workers are spawned, not forked, so they never inherit the server's
+        # threads and locks. Under `streamlit run` the app script is __main__,
+        # which spawned children would re-run on start-up, so every worker is
+        # started right away with this module standing in as __main__.
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            for _ in range(self.workers):
+                executor.submit(int)
+        finally:
+            sys.modules["__main__"] = main
+        return executor
+
+    def _completed(self, job, future):
+        try:
+            data, error = future.result(), None
+        except BrokenProcessPool:
+            data, error = None, BrokenProcessPool
+        except Exception as e:
+            data, error = None, str(e) or type(e).__name__
+        with self._lock:
+            # Ignore futures of a killed pool or of a job that was requeued
+            if job.future is not future or job.status != RUNNING:
+                return
+            if error is BrokenProcessPool:
+                # A worker process died (killed, out of memory, crashed)
+                self._restart_pool()
+            else:
+                self._running.discard(job)
+                if data is not None:
+                    self.cache.put(job.key, data)
+                    self._finish(job, DONE)
+                else:
+                    self._finish(job, FAILED, error)
+            self._dispatch()
+
+    def _restart_pool(self):
+        # Caller holds the lock. The pool is unusable once a worker dies: running
+        # jobs go back to the front of the line (or fail if they were already
+        # suspects) and the next dispatch starts a new pool. Shutting the old one down
+        # runs future callbacks, which take the lock, so that happens elsewhere.
+        for job in sorted(self._running, key=lambda j: j.id, reverse=True):
+            job.crashes += 1
+            if job.crashes >= MAX_CRASHES:
+                self._finish(job, FAILED, "render worker process died")
+            else:
+                job.status, job.started_at, job.future = QUEUED, None, None
+                self._pending.appendleft(job)
+        self._running.clear()
+        old, self._executor = self._executor, None
+        threading.Thread(target=self._kill, args=(old,), name="render-pool-reaper", daemon=True).start()
+
+    def _finish(self, job, status, error=None):
+        # Caller holds the lock
+        self._running.discard(job)
+        job.status, job.error, job.finished_at = status, error, time.time()
+        job.args = job.future = None
+        job._done.set()
+
+    def _forget_old(self):
+        # Caller holds the lock; drop the oldest finished jobs past keep_finished
+        finished = [k for k, jid in self._by_key.items() if self._jobs[jid].status in (DONE, FAILED)]
+        for key in finished[:max(0, len(finished) - self.keep_finished)]:
+            self._jobs.pop(self._by_key.pop(key), None)
+
+    @staticmethod
+    def _kill(executor):
+        if executor is None:
+            return
+        kill = getattr(executor, "kill_workers", None)
+        if kill is not None:
+            kill()
+        else:
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,223 @@
+# --- Per-session artifact storage and memory accounting ---
+# Large per-session artifacts (share card images, ...) are written once to a
+# content-addressed store on disk (<root>/<sha256[:2]>/<sha256>) and sessions
+# keep only the digest ("handle") in st.session_state. Identical blobs from
+# different sessions share one file. The store also estimates how much memory
+# each session's state holds. Sessions idle past ``idle_timeout`` lose their
+# artifacts, and a blob file is deleted once no session refers to it.
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from workers import PeriodicWorker
+
+STORE_DIR = os.path.join(tempfile.gettempdir(), "lovebook-session-blobs")
+IDLE_TIMEOUT = 30 * 60
+SWEEP_INTERVAL = 60.0
+
+
+def estimate_size(value, _depth=0):
+    """Rough bytes held by a session-state value (payloads, not interpreter overhead)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    if _depth > 4:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(estimate_size(v, _depth + 1) for v in value)
+    # Uploaded files report their payload size
+    size = getattr(value, "size", None)
+    if isinstance(size, int):
+        return size
+    if hasattr(value, "__dict__"):
+        return estimate_size(vars(value), _depth + 1)
+    return sys.getsizeof(value)
+
+
+class SessionStore:
+    def __init__(self, root=STORE_DIR, idle_timeout=IDLE_TIMEOUT, sweep_interval=SWEEP_INTERVAL):
+        self.root = root
+        self.idle_timeout = idle_timeout
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # session_id -> {name: handle}
+        self._handles = {}
+        # handle -> number of (session, name) slots referring to it
+        self._refs = {}
+        # session_id -> (last_seen, estimated state bytes)
+        self._seen = {}
+        self._worker = PeriodicWorker(self.evict_idle, sweep_interval, name="session-sweeper").start()
+
+    def path(self, handle):
+        return os.path.join(self.root, handle[:2], handle)
+
+    def put(self, session_id, name, data):
+        """Store ``data`` as the session's ``name`` artifact; returns its handle."""
+        handle = hashlib.sha256(data).hexdigest()
+        orphan = self._claim(session_id, name, handle)
+        path = self.path(handle)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self._delete(orphan)
+        return handle
+
+    def spool(self):
+        """Path of a new empty file inside the store, for building an artifact with put_file()."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        os.close(fd)
+        return tmp_path
+
+    def put_file(self, session_id, name, tmp_path):
+        """Move the finished file at ``tmp_path`` (from spool()) into the store; returns its handle."""
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            while block := f.read(1 << 20):
+                digest.update(block)
+        handle = digest.hexdigest()
+        orphan = self._claim(session_id, name, handle)
+        path = self.path(handle)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        self._delete(orphan)
+        return handle
+
+    def exists(self, handle):
+        return bool(handle) and os.path.exists(self.path(handle))
+
+    def read(self, handle):
+        with open(self.path(handle), "rb") as f:
+            return f.read()
+
+    def discard(self, session_id, name):
+        with self._lock:
+            orphan = self._release(self._handles.get(session_id, {}).pop(name, None))
+        self._delete(orphan)
+
+    def touch(self, session_id, state=None):
+        """Mark the session active and record the estimated size of its ``state``."""
+        with self._lock:
+            previous = self._seen.get(session_id, (0, 0))[1]
+        size = previous if state is None else sum(estimate_size(v) for v in state.values())
+        with self._lock:
+            self._seen[session_id] = (time.time(), size)
+
+    def drop(self, session_id):
+        """Forget a session and delete blobs only it referred to."""
+        with self._lock:
+            self._seen.pop(session_id, None)
+            orphans = [self._release(h) for h in self._handles.pop(session_id, {}).values()]
+        for orphan in orphans:
+            self._delete(orphan)
+
+    def evict_idle(self, now=None):
+        """Drop sessions idle longer than ``idle_timeout``; returns how many were dropped."""
+        cutoff = (now or time.time()) - self.idle_timeout
+        with self._lock:
+            idle = [sid for sid, (seen, _) in self._seen.items() if seen < cutoff]
+        for session_id in idle:
+            self.drop(session_id)
+        self._sweep_files(cutoff)
+        return len(idle)
+
+    def stats(self):
+        """Per-session and total memory (estimated) and disk use."""
+        now = time.time()
+        with self._lock:
+            handles = {sid: dict(slots) for sid, slots in self._handles.items()}
+            seen = dict(self._seen)
+        sizes, sessions = {}, {}
+        for session_id, (last_seen, memory) in seen.items():
+            disk = 0
+            for handle in handles.get(session_id, {}).values():
+                if handle not in sizes:
+                    try:
+                        sizes[handle] = os.path.getsize(self.path(handle))
+                    except OSError:
+                        sizes[handle] = 0
+                disk += sizes[handle]
+            sessions[session_id] = {"memory_bytes": memory, "disk_bytes": disk, "idle_s": round(now - last_seen)}
+        return {
+            "sessions": len(sessions),
+            "memory_bytes": sum(s["memory_bytes"] for s in sessions.values()),
+            # Shared blobs are counted once in the total
+            "disk_bytes": sum(sizes.values()),
+            "per_session": sessions,
+        }
+
+    def close(self):
+        self._worker.stop()
+
+    def _sweep_files(self, cutoff):
+        # Blobs nobody refers to, e.g. left behind by a previous process
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                # Spool files abandoned half-written
+                if shard.name.endswith(".part") and shard.stat().st_mtime < cutoff:
+                    try:
+                        os.remove(shard.path)
+                    except FileNotFoundError:
+                        pass
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        continue
+                    # Same rule as _delete(): the reference check and the removal share the lock
+                    with self._lock:
+                        if entry.name not in self._refs:
+                            os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _claim(self, session_id, name, handle):
+        # Take the reference before the file is written so a concurrent release
+        # keeps it; returns the handle this slot held before if it is now unused
+        with self._lock:
+            slots = self._handles.setdefault(session_id, {})
+            old = slots.get(name)
+            orphan = None
+            if old != handle:
+                slots[name] = handle
+                self._refs[handle] = self._refs.get(handle, 0) + 1
+                orphan = self._release(old)
+            self._seen[session_id] = (time.time(), self._seen.get(session_id, (0, 0))[1])
+        return orphan
+
+    def _release(self, handle):
+        # Caller holds the lock; returns the handle if its file should be deleted
+        if handle is None:
+            return None
+        count = self._refs.get(handle, 0) - 1
+        if count > 0:
+            self._refs[handle] = count
+            return None
+        self._refs.pop(handle, None)
+        return handle
+
+    def _delete(self, handle):
+        if handle is None:
+            return
+        # Checked and removed under the lock: a put() of the same blob claims its
+        # reference first, so it either keeps this file or writes it again after
+        with self._lock:
+            if handle in self._refs:
+                # Re-referenced since it was released
+                return
+            try:
+                os.remove(self.path(handle))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,62 @@
+# --- Uploaded backgrounds served through Streamlit's static file route ---
+# Needs [server] enableStaticServing = true (see .streamlit/config.toml).
+# Files under ./static are served at app/static/<path>. Backgrounds are stored
+# once under a content-hash name, so a URL never changes meaning and the
+# browser can keep reusing its cached copy (Streamlit answers with ETag /
+# Last-Modified) instead of receiving a base64 data URI on every rerun.
+
+import os
+import tempfile
+import threading
+
+from image_assets import content_hash, extension, get_asset_cache
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+BACKGROUND_DIR = os.path.join(STATIC_DIR, "backgrounds")
+STATIC_URL = "app/static/backgrounds"
+# Oldest backgrounds are deleted once the folder grows past this
+MAX_BACKGROUND_DIR_BYTES = 256 * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def publish_background(data, rendition="web"):
+    """Store the ``rendition`` of image ``data`` under static/ and return its URL."""
+    digest = content_hash(data)
+    filename = f"{digest}{extension(rendition)}"
+    path = os.path.join(BACKGROUND_DIR, filename)
+    try:
+        # Reuse counts as use, so _prune() drops the least recently used backgrounds first
+        os.utime(path)
+    except FileNotFoundError:
+        encoded = get_asset_cache().get(data, rendition, digest=digest)
+        os.makedirs(BACKGROUND_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=BACKGROUND_DIR, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+        _prune(keep=path)
+    return f"{STATIC_URL}/{filename}"
+
+
+def _prune(keep):
+    with _lock:
+        entries = []
+        for name in os.listdir(BACKGROUND_DIR):
+            full = os.path.join(BACKGROUND_DIR, name)
+            if name.endswith(".part") or full == keep:
+                continue
+            try:
+                stat = os.stat(full)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, full))
+        total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+        for _, size, full in sorted(entries):
+            if total <= MAX_BACKGROUND_DIR_BYTES:
+                break
+            try:
+                os.remove(full)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,124 @@
+# --- Parsed story model ---
+# A memory book story is "<title>\n\n" followed by "Page N: <question>\n\n<answer>\n\n"
+# per answered question. StoryModel parses that once (pages, entries, word
+# counts, offsets) so reruns read the counts instead of re-splitting the text,
+# and with_answer() rebuilds a single page when one answer changes.
+
+import re
+from functools import cached_property
+from typing import NamedTuple, Optional
+
+# Universal question set for all couples: (question, placeholder, key, tip)
+UNIVERSAL_QUESTIONS = [
+    ("How did you first meet or notice each other?", "E.g. At a coffee shop, college, online...", "first_meeting", "Tip: Recall your first encounter."),
+    ("What's your favorite memory together?", "E.g. Trips, celebrations, funny moments...", "fav_memory", "Tip: A moment that stands out!"),
+    ("Describe a challenge you overcame as a couple.", "E.g. Moving, studies, raising kids...", "challenge", "Tip: How did you support each other?"),
+    ("What keeps your bond strong?", "E.g. Shared rituals, humor, communication...", "bond", "Tip: Your secret to lasting love!"),
+    ("What is your dream for the future together?", "E.g. Travel, family, new adventures...", "future_dream", "Tip: Looking ahead."),
+    ("What was your first date like?", "E.g. Nervous, exciting...", "first_date", "Tip: Recall your first outing together."),
+    ("Describe a funny or embarrassing moment together.", "E.g. Mishaps, jokes...", "funny_moment", "Tip: Light-hearted stories."),
+    ("What is your favorite way to spend time together?", "E.g. Walks, cooking...", "fav_time", "Tip: Daily routines or special occasions."),
+    ("How do you handle disagreements?", "E.g. Communication, humor...", "handle_disagreements", "Tip: Conflict resolution."),
+    ("What advice would you give to couples?", "E.g. Patience, kindness...", "couple_advice", "Tip: Share your wisdom.")
+]
+
+_PAGE_HEADER = re.compile(r"^Page (\d+): (.*)$", re.DOTALL)
+
+
+class StoryPage(NamedTuple):
+    number: int
+    question: str
+    answer: str
+    key: Optional[str] = None
+    words: int = 0
+    # Character offset of the page header within the story text
+    offset: int = 0
+
+
+def _count_words(text):
+    return len(text.split())
+
+
+def _page_text(page):
+    return f"Page {page.number}: {page.question}\n\n{page.answer}\n\n"
+
+
+class StoryModel:
+    def __init__(self, title, pages, text=None):
+        self.title = title
+        self.pages = []
+        header = f"\n{title}\n\n"
+        offset = len(header)
+        parts = [header]
+        for page in pages:
+            body = _page_text(page)
+            # Pages carried over from another model keep their count
+            words = page.words or _count_words(f"Page {page.number}: {page.question}") + _count_words(page.answer)
+            self.pages.append(page._replace(words=words, offset=offset))
+            parts.append(body)
+            offset += len(body)
+        self.text = text if text is not None else "".join(parts)
+        self.word_count = _count_words(title) + sum(p.words for p in self.pages)
+
+    @cached_property
+    def entries(self):
+        """Viewer entries: the title, then each page header and answer."""
+        out = [self.title] if self.title else []
+        for page in self.pages:
+            out.append(f"Page {page.number}: {page.question}")
+            if page.answer:
+                out.append(page.answer)
+        return out
+
+    @property
+    def entry_count(self):
+        return len(self.entries)
+
+    def page_for(self, key):
+        for page in self.pages:
+            if page.key == key:
+                return page
+        return None
+
+    @classmethod
+    def parse(cls, text):
+        """Parse a saved story string (as stored in the database)."""
+        title_blocks, pages = [], []
+        for block in (text or "").split("\n\n"):
+            match = _PAGE_HEADER.match(block.strip())
+            if match:
+                pages.append([int(match.group(1)), match.group(2), []])
+            elif pages:
+                pages[-1][2].append(block)
+            elif block.strip():
+                title_blocks.append(block.strip())
+        parsed = [
+            StoryPage(number, question, "\n\n".join(answer).strip())
+            for number, question, answer in pages
+        ]
+        return cls("\n\n".join(title_blocks), parsed, text=text or "")
+
+    @classmethod
+    def build(cls, couple_names, questions, answers):
+        """Build a story from ``{question_key: answer}`` for the question set."""
+        pages = []
+        for idx, (q, _, key, _) in enumerate(questions):
+            ans = (answers.get(key) or '').strip()
+            if ans:
+                pages.append(StoryPage(idx + 1, q, ans, key))
+        return cls(f"{couple_names}'s Memory Book", pages)
+
+    def with_answer(self, questions, key, answer):
+        """Model with one answer replaced; other pages are reused as-is."""
+        answer = (answer or '').strip()
+        pages = [p for p in self.pages if p.key != key]
+        if answer:
+            for idx, (q, _, qkey, _) in enumerate(questions):
+                if qkey == key:
+                    pages.append(StoryPage(idx + 1, q, answer, key))
+                    pages.sort(key=lambda p: p.number)
+                    break
+        return StoryModel(self.title, pages)
+
+    def with_title(self, couple_names):
+        return StoryModel(f"{couple_names}'s Memory Book", self.pages)
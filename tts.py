@@ -0,0 +1,272 @@
+# --- Text-to-speech jobs for "Download Your Story as Audio" ---
+# Stories are synthesized on background workers, one paragraph chunk at a
+# time in parallel, and each chunk is spooled to disk as soon as it is ready
+# so playback can start early. The chunks are then joined into a single MP3
+# (MP3 frames can be concatenated byte-for-byte). Spooled audio is cached by
+# (story hash, voice, engine) so the same story is only synthesized once.
+#
+# The engine is pluggable: EdgeTTSSynthesizer talks to the edge-tts service,
+# LocalSynthesizer writes silent MP3 frames and works offline
+# (LOVEBOOK_TTS_ENGINE=local).
+
+import asyncio
+import hashlib
+import itertools
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TTS_ENGINE = os.environ.get("LOVEBOOK_TTS_ENGINE", "edge")
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "lovebook-tts")
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Paragraphs are merged/split so each request to the engine stays around this size
+CHUNK_CHARS = 1200
+# Finished spools stay on disk at least this long, since sessions play them by path
+SPOOL_GRACE = 30 * 60
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class EdgeTTSSynthesizer:
+    name = "edge"
+
+    def __init__(self):
+        import edge_tts  # noqa: F401  (fail early when the package is missing)
+
+    def synthesize(self, text, voice, out_path):
+        import edge_tts
+        # Each worker thread runs its own short-lived event loop
+        asyncio.run(edge_tts.Communicate(text, voice).save(out_path))
+
+
+class LocalSynthesizer:
+    """Offline stand-in: silent MPEG-1 Layer III frames, roughly 0.4s per word."""
+
+    name = "local"
+    # 128 kbps, 44.1 kHz, mono, no CRC; 417-byte frames of 1152 samples
+    FRAME = bytes([0xFF, 0xFB, 0x90, 0xC0]) + bytes(413)
+    FRAMES_PER_WORD = 15
+
+    def synthesize(self, text, voice, out_path):
+        frames = max(1, len(text.split())) * self.FRAMES_PER_WORD
+        with open(out_path, "wb") as f:
+            f.write(self.FRAME * frames)
+
+
+def make_synthesizer(engine=TTS_ENGINE):
+    if engine == "local":
+        return LocalSynthesizer()
+    return EdgeTTSSynthesizer()
+
+
+def split_chunks(text, max_chars=CHUNK_CHARS):
+    """Split text on blank lines, merging short paragraphs and splitting long ones by sentence."""
+    pieces = []
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            pieces.append(para)
+            continue
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", para):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            pieces.append(current)
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + len(piece) + 2 <= max_chars:
+            chunks[-1] = f"{chunks[-1]}\n\n{piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def job_key(text, voice, engine):
+    return hashlib.sha256(f"{engine}\0{voice}\0{text}".encode()).hexdigest()
+
+
+class TTSJob:
+    def __init__(self, job_id, key, chunks, spool_dir):
+        self.id = job_id
+        self.key = key
+        self.chunks = chunks
+        self.spool_dir = spool_dir
+        self.status = QUEUED
+        self.done_chunks = 0
+        self.ready = [False] * len(chunks)
+        self.path = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def total_chunks(self):
+        return len(self.chunks)
+
+    @property
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        return self.done_chunks / self.total_chunks if self.chunks else 0.0
+
+    def chunk_path(self, index):
+        return os.path.join(self.spool_dir, f"part-{index:04d}.mp3")
+
+    def ready_chunks(self):
+        """Paths of the parts playable in order so far (stops at the first gap)."""
+        paths = []
+        for index, ready in enumerate(self.ready):
+            if not ready:
+                break
+            paths.append(self.chunk_path(index))
+        return paths
+
+
+class TTSService:
+    """Runs TTS jobs and spools their audio to disk.
+
+    Each job gets a spool folder ``<cache_dir>/<key>/`` holding one MP3 per
+    chunk (written as soon as that chunk is synthesized, so playback can start
+    before the story is finished) plus the joined ``story.mp3``. Callers get
+    file paths, never audio bytes. Spool folders are evicted oldest-first once
+    the cache grows past ``max_cache_bytes``, except those of running jobs and
+    of jobs finished less than ``spool_grace`` seconds ago.
+    """
+
+    def __init__(self, synthesizer=None, cache_dir=CACHE_DIR, workers=2, chunk_workers=4,
+                 max_cache_bytes=CACHE_MAX_BYTES, spool_grace=SPOOL_GRACE, keep_finished=256):
+        self.synthesizer = synthesizer or make_synthesizer()
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.spool_grace = spool_grace
+        self.keep_finished = keep_finished
+        os.makedirs(cache_dir, exist_ok=True)
+        self._jobs = {}
+        self._by_key = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._job_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-job")
+        self._chunk_pool = ThreadPoolExecutor(max_workers=chunk_workers, thread_name_prefix="tts-chunk")
+
+    def submit(self, text, voice):
+        """Queue ``text`` for synthesis; an identical running or cached job is reused."""
+        key = job_key(text, voice, self.synthesizer.name)
+        spool_dir = os.path.join(self.cache_dir, key)
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and job.status != FAILED and (job.status != DONE or os.path.exists(job.path)):
+                return job
+            job = TTSJob(next(self._ids), key, split_chunks(text), spool_dir)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            self._forget_old()
+        final = os.path.join(spool_dir, "story.mp3")
+        if os.path.exists(final):
+            os.utime(spool_dir)
+            job.ready = [os.path.exists(job.chunk_path(i)) for i in range(job.total_chunks)]
+            job.path, job.done_chunks, job.finished_at, job.status = final, job.total_chunks, time.time(), DONE
+            return job
+        self._job_pool.submit(self._run, job, voice)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queued_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def queue_position(self, job):
+        """1-based place of a queued job among those waiting for a worker (0 if not waiting)."""
+        if job.status != QUEUED:
+            return 0
+        with self._lock:
+            return 1 + sum(1 for other in self._jobs.values() if other.status == QUEUED and other.id < job.id)
+
+    def _run(self, job, voice):
+        job.status = RUNNING
+        try:
+            os.makedirs(job.spool_dir, exist_ok=True)
+
+            def synth(i):
+                part = job.chunk_path(i)
+                tmp_path = f"{part}.part"
+                self.synthesizer.synthesize(job.chunks[i], voice, tmp_path)
+                os.replace(tmp_path, part)
+                with self._lock:
+                    job.ready[i] = True
+                    job.done_chunks += 1
+
+            # Submitted in story order, so early parts become playable first
+            for future in [self._chunk_pool.submit(synth, i) for i in range(job.total_chunks)]:
+                future.result()
+            final = os.path.join(job.spool_dir, "story.mp3")
+            with open(f"{final}.part", "wb") as out:
+                for path in job.ready_chunks():
+                    with open(path, "rb") as f:
+                        while block := f.read(1 << 16):
+                            out.write(block)
+            os.replace(f"{final}.part", final)
+            job.path = final
+            job.finished_at = time.time()
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.status = FAILED
+        finally:
+            with self._lock:
+                self._forget_old()
+            self._evict()
+
+    def _forget_old(self):
+        # Caller holds the lock; drop the oldest finished jobs past keep_finished
+        finished = [job for job in self._jobs.values() if job.status in (DONE, FAILED)]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def _evict(self):
+        cutoff = time.time() - self.spool_grace
+        with self._lock:
+            # Running jobs, and finished ones sessions may still be playing
+            keep = {job.key for job in self._jobs.values()
+                    if job.status in (QUEUED, RUNNING) or (job.status == DONE and job.finished_at > cutoff)}
+        spools = []
+        # Kept spools count against the cap too; only the others can be removed to meet it
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            full = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(full):
+                continue
+            try:
+                size = 0
+                for entry in os.scandir(full):
+                    size += entry.stat().st_size
+                mtime = os.stat(full).st_mtime
+            except FileNotFoundError:
+                # Evicted by another job finishing at the same time
+                continue
+            total += size
+            if name not in keep:
+                spools.append((mtime, size, full))
+        for _, size, full in sorted(spools):
+            if total <= self.max_cache_bytes:
+                break
+            shutil.rmtree(full, ignore_errors=True)
+            total -= size
+
+    def shutdown(self):
+        self._job_pool.shutdown(wait=False, cancel_futures=True)
+        self._chunk_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,273 @@
+# --- Venue batch job: books, certificates and cards for a whole event ---
+# Reads a CSV or JSONL of couples and their answers, builds each story with the
+# app's question set (story.UNIVERSAL_QUESTIONS) and renders the memory book
+# PDF, Certificate of Love and share-card ZIP for every couple in a pool of
+# worker processes, one couple per task. Each couple gets a folder under the
+# output directory, and a line is appended to <output>/checkpoint.jsonl when it
+# is finished, so a run that is stopped (or crashes) picks up where it left
+# off. Couples that failed are retried on the next run, and so are input rows
+# that could not be read, which are logged as failed and skipped.
+#
+#     python venue_batch.py couples.csv -o out/ --workers 8
+#     python venue_batch.py couples.jsonl -o out/ --outputs pdf,certificate --background venue.jpg
+#
+# Input: ``names``, or ``partner1`` and ``partner2``; one field per question key
+# (first_meeting, fav_memory, ...) or, in JSONL, an ``answers`` object; an
+# optional ``id`` (the line number otherwise, so keep the file's order when
+# resuming) and an optional certificate ``date``. LOVEBOOK_BRAND sets the
+# certificate branding as in the app.
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from cards import BRAND, DEFAULT_TEMPLATE, FORMATS, TEMPLATES, book_cards, extension, render_card
+from certificates import frame_path, render_certificate
+from pdf_export import render_pdf
+from story import UNIVERSAL_QUESTIONS, StoryModel
+
+OUTPUTS = ("pdf", "certificate", "cards")
+CHECKPOINT_NAME = "checkpoint.jsonl"
+CARD_COLORS = ("#ffb6b9", "#b91372")
+PROGRESS_EVERY = 10.0
+
+_QUESTION_KEYS = tuple(key for _, _, key, _ in UNIVERSAL_QUESTIONS)
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def _text(value):
+    # JSONL values may be numbers (an id, a date like 20260214) rather than strings
+    return "" if value is None else str(value).strip()
+
+
+def _names(record):
+    names = _text(record.get("names"))
+    if names:
+        return names
+    partners = (_text(record.get("partner1")), _text(record.get("partner2")))
+    return " & ".join(p for p in partners if p)
+
+
+def _entry(record, line):
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {type(record).__name__}")
+    answers = record.get("answers") if isinstance(record.get("answers"), dict) else record
+    return {
+        "id": _text(record.get("id")) or f"{line:06d}",
+        "names": _names(record),
+        "answers": {key: str(answers.get(key) or "") for key in _QUESTION_KEYS},
+        "date": _text(record.get("date")) or None,
+    }
+
+
+def read_entries(path):
+    """Yield couples from a .jsonl or .csv file as {"id", "names", "answers", "date"}.
+
+    A line that cannot be read is yielded as {"id", "error"} instead.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    entry = _entry(json.loads(text), line)
+                except ValueError as e:
+                    yield {"id": f"{line:06d}", "error": f"{path}:{line}: {e}"}
+                    continue
+                yield entry
+        else:
+            for line, row in enumerate(csv.DictReader(f), 2):
+                yield _entry({(k or "").strip().lower(): v for k, v in row.items()}, line)
+
+
+def load_checkpoint(path):
+    """Ids of the couples a previous run finished."""
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for text in f:
+                try:
+                    record = json.loads(text)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+                if record.get("status") == "done":
+                    done.add(record["id"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def _write_cards(path, cards):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    os.close(fd)
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for index, args in enumerate(cards, 1):
+            archive.writestr(f"card-{index:02d}{extension(args[4])}", render_card(*args))
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def process_entry(entry, out_dir, outputs, bg_bytes=None, brand=BRAND, card_template=DEFAULT_TEMPLATE, card_format="PNG"):
+    """Render ``outputs`` for one couple into its own folder; returns bytes written per output.
+
+    Runs in a worker process.
+    """
+    if not entry["names"]:
+        raise ValueError("no names")
+    model = StoryModel.build(entry["names"], UNIVERSAL_QUESTIONS, entry["answers"])
+    if "pdf" in outputs and not model.pages:
+        raise ValueError("no answers")
+    # Only rows that passed the checks get a folder
+    folder = os.path.join(out_dir, _UNSAFE.sub("-", entry["id"]).strip("-") or "entry")
+    os.makedirs(folder, exist_ok=True)
+    # Half-written files from an interrupted run
+    for name in os.listdir(folder):
+        if name.endswith(".part"):
+            os.remove(os.path.join(folder, name))
+    written = {}
+    if "pdf" in outputs:
+        data = render_pdf(f"{entry['names']} - Memory Book", model.text, bg_bytes)
+        written["pdf"] = _write(os.path.join(folder, "memory_book.pdf"), data)
+    if "certificate" in outputs:
+        data = render_certificate(entry["names"], entry["date"], brand)
+        written["certificate"] = _write(os.path.join(folder, "certificate_of_love.pdf"), data)
+    if "cards" in outputs:
+        cards = book_cards(model, *CARD_COLORS, card_template, card_format)
+        written["cards"] = _write_cards(os.path.join(folder, "cards.zip"), cards)
+    return written
+
+
+class Checkpoint:
+    """Append-only log of finished couples, flushed per line so a crash loses at most one."""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, entry_id, status, **fields):
+        self._file.write(json.dumps({"id": entry_id, "status": status, **fields}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def run(entries, out_dir, outputs=OUTPUTS, workers=None, bg_bytes=None, brand=BRAND,
+        card_template=DEFAULT_TEMPLATE, card_format="PNG", progress_every=PROGRESS_EVERY):
+    """Process every couple not already in the checkpoint; returns a summary dict."""
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint_path = os.path.join(out_dir, CHECKPOINT_NAME)
+    finished = load_checkpoint(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+    if "certificate" in outputs:
+        # Draw the frame before the workers start so they all find it on disk
+        frame_path(brand)
+    workers = workers or os.cpu_count() or 2
+    summary = {"done": 0, "failed": 0, "skipped": 0, "bytes": dict.fromkeys(outputs, 0)}
+    started = last_report = time.perf_counter()
+    in_flight = {}
+
+    def fail(entry_id, error):
+        summary["failed"] += 1
+        checkpoint.record(entry_id, "failed", error=error)
+        print(f"  {entry_id}: failed: {error}", file=sys.stderr)
+
+    def collect(futures):
+        for future in futures:
+            entry_id = in_flight.pop(future)
+            try:
+                written = future.result()
+            except Exception as e:
+                fail(entry_id, str(e) or type(e).__name__)
+                continue
+            summary["done"] += 1
+            for name, size in written.items():
+                summary["bytes"][name] += size
+            checkpoint.record(entry_id, "done", bytes=written)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            try:
+                for entry in entries:
+                    if entry["id"] in finished:
+                        summary["skipped"] += 1
+                        continue
+                    if "error" in entry:
+                        # A row that could not be read; the rest of the run goes on
+                        fail(entry["id"], entry["error"])
+                        continue
+                    # Keep a few tasks per worker in flight, so thousands of rows are never all in memory
+                    while len(in_flight) >= workers * 4:
+                        collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+                    future = executor.submit(process_entry, entry, out_dir, outputs, bg_bytes, brand, card_template, card_format)
+                    in_flight[future] = entry["id"]
+                    now = time.perf_counter()
+                    if now - last_report >= progress_every:
+                        last_report = now
+                        print(f"  {summary['done']} done, {summary['failed']} failed "
+                              f"({summary['done'] / (now - started):.1f} couples/s)")
+            finally:
+                # Couples already handed to the workers are checkpointed even if
+                # reading the input failed part way
+                collect(wait(in_flight).done)
+    finally:
+        checkpoint.close()
+    summary["elapsed"] = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render memory books, certificates and cards for a venue's couples.")
+    parser.add_argument("input", help="CSV or JSONL of couples and answers")
+    parser.add_argument("-o", "--output", required=True, help="output directory (also holds the checkpoint)")
+    parser.add_argument("--outputs", default=",".join(OUTPUTS), help=f"comma-separated subset of {', '.join(OUTPUTS)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--background", help="page background image for the memory book PDFs")
+    parser.add_argument("--brand", default=os.environ.get("LOVEBOOK_BRAND", BRAND), help="certificate branding")
+    parser.add_argument("--card-template", choices=sorted(TEMPLATES), default=DEFAULT_TEMPLATE)
+    parser.add_argument("--card-format", choices=sorted(FORMATS), default="PNG")
+    parser.add_argument("--progress-every", type=float, default=PROGRESS_EVERY, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    outputs = tuple(o.strip() for o in args.outputs.split(",") if o.strip())
+    unknown = set(outputs) - set(OUTPUTS)
+    if unknown or not outputs:
+        parser.error(f"--outputs must be a subset of {', '.join(OUTPUTS)}")
+    bg_bytes = None
+    if args.background:
+        with open(args.background, "rb") as f:
+            bg_bytes = f.read()
+
+    try:
+        summary = run(read_entries(args.input), args.output, outputs, args.workers, bg_bytes, args.brand,
+                      args.card_template, args.card_format, args.progress_every)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    elapsed = summary["elapsed"]
+    print(f"{summary['done']} couples in {elapsed:.1f}s ({summary['done'] / max(elapsed, 1e-9):.1f}/s), "
+          f"{summary['failed']} failed, {summary['skipped']} already done")
+    for name, size in summary["bytes"].items():
+        print(f"  {name}: {size / 1e6:.1f} MB")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
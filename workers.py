@@ -0,0 +1,55 @@
+# --- Background workers shared by the LoveBook services ---
+
+import atexit
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    """Call ``fn`` every ``interval`` seconds on a daemon thread.
+
+    ``wake()`` runs it early (e.g. when a buffer hits its size limit) and
+    ``stop()`` runs it one last time, so buffered writes are not lost at
+    interpreter shutdown.
+    """
+
+    def __init__(self, fn, interval, name=None):
+        self.fn = fn
+        self.interval = interval
+        self.name = name or getattr(fn, "__name__", "worker")
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wake.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+        self._call()
+
+    def _call(self):
+        try:
+            self.fn()
+        except Exception:
+            log.exception("%s failed", self.name)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped:
+                break
+            self._call()